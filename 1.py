@@ -1,6 +1,10 @@
 import pygame
+import textcache
 import random
 import time
+from array import array
+from collections import deque
+from dirtyrect import DirtyRectRenderer
 
 # Initialize Pygame
 pygame.init()
@@ -22,65 +26,130 @@ GREEN = (0, 255, 0)
 screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
 pygame.display.set_caption('Snake Game')
 
+# The snake's body is a deque of cells, head first, with a per-cell
+# occupancy count and an index of free cells, so moving, self-collision
+# and placing food cost the same however long the snake or big the board.
+
 class Snake:
-    def __init__(self):
-        self.positions = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
-        self.direction = (1, 0)
-        self.length = 1
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
+        self.width = width
+        self.height = height
+        self.reset()
 
     def get_head_position(self):
         return self.positions[0]
 
+    def cell(self, position):
+        return position[1] * self.width + position[0]
+
+    def occupy(self, position):
+        index = self.cell(position)
+        self.occupied[index] += 1
+        if self.occupied[index] == 1:
+            # Swap the last free cell into this one's slot
+            slot = self.free_slot[index]
+            last = self.free[-1]
+            self.free[slot] = last
+            self.free_slot[last] = slot
+            self.free.pop()
+
+    def vacate(self, position):
+        index = self.cell(position)
+        self.occupied[index] -= 1
+        if self.occupied[index] == 0:
+            self.free_slot[index] = len(self.free)
+            self.free.append(index)
+
     def update(self):
         cur = self.get_head_position()
         x, y = self.direction
-        new = ((cur[0] + x) % GRID_WIDTH, (cur[1] + y) % GRID_HEIGHT)
-        
-        if new in self.positions[2:]:
+        new = ((cur[0] + x) % self.width, (cur[1] + y) % self.height)
+
+        # Same rule as `new in positions[2:]`: segments on the cell other than the head and neck
+        others = self.occupied[self.cell(new)] - (new == cur) - (len(self.positions) > 1 and new == self.positions[1])
+        if others > 0:
             return False
-        
-        self.positions.insert(0, new)
-        if len(self.positions) > self.length:
-            self.positions.pop()
+
+        self.removed = None
+        if len(self.positions) >= self.length:
+            self.removed = self.positions.pop()
+            self.vacate(self.removed)
+        self.positions.appendleft(new)
+        self.occupy(new)
         return True
 
     def reset(self):
-        self.positions = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
+        cells = self.width * self.height
+        self.occupied = bytearray(cells)  # Segments on each cell
+        self.free = array('l', range(cells))  # Cells without a segment
+        self.free_slot = array('l', range(cells))  # Where each free cell sits in self.free
+        self.positions = deque()
+        self.positions.append((self.width // 2, self.height // 2))
+        self.occupy(self.positions[0])
         self.direction = (1, 0)
         self.length = 1
+        self.removed = None  # Tail cell vacated by the last update
 
-    def render(self, surface):
+    def render(self, surface, cell_size=GRID_SIZE):
         for p in self.positions:
-            pygame.draw.rect(surface, GREEN,
-                           (p[0] * GRID_SIZE, p[1] * GRID_SIZE,
-                            GRID_SIZE - 2, GRID_SIZE - 2))
+            draw_cell(surface, GREEN, p, cell_size)
 
 class Food:
-    def __init__(self):
+    def __init__(self, snake):
+        self.snake = snake
         self.position = (0, 0)
         self.randomize_position()
 
     def randomize_position(self):
-        self.position = (random.randint(0, GRID_WIDTH - 1),
-                        random.randint(0, GRID_HEIGHT - 1))
+        # Any cell the snake is not on; None once the board is full
+        free = self.snake.free
+        if not free:
+            self.position = None
+            return
+        index = free[random.randrange(len(free))]
+        self.position = (index % self.snake.width, index // self.snake.width)
+
+    def render(self, surface, cell_size=GRID_SIZE):
+        if self.position:
+            draw_cell(surface, RED, self.position, cell_size)
+
+def cell_rect(position, cell_size):
+    gap = 2 if cell_size > 4 else 0
+    return pygame.Rect(position[0] * cell_size, position[1] * cell_size, cell_size - gap, cell_size - gap)
 
-    def render(self, surface):
-        pygame.draw.rect(surface, RED,
-                        (self.position[0] * GRID_SIZE,
-                         self.position[1] * GRID_SIZE,
-                         GRID_SIZE - 2, GRID_SIZE - 2))
+def draw_cell(surface, color, position, cell_size):
+    return surface.fill(color, cell_rect(position, cell_size))
+
+def fit_cell_size(width, height):
+    # Cell size for a grid, shrinking cells to keep big boards on screen
+    return max(1, min(GRID_SIZE, WINDOW_WIDTH // width, WINDOW_HEIGHT // height))
+
+def main(width=GRID_WIDTH, height=GRID_HEIGHT):
+    global screen
+    cell_size = fit_cell_size(width, height)
+    if (width * cell_size, height * cell_size) != screen.get_size():
+        screen = pygame.display.set_mode((width * cell_size, height * cell_size))
 
-def main():
     clock = pygame.time.Clock()
-    snake = Snake()
-    food = Food()
+    snake = Snake(width, height)
+    food = Food(snake)
     score = 0
     game_over = False
 
+    # The board holds the snake and food and is only touched where they
+    # change; the renderer copies those cells and the text to the screen
+    board = pygame.Surface(screen.get_size())
+    board.fill(BLACK)
+    snake.render(board, cell_size)
+    food.render(board, cell_size)
+    renderer = DirtyRectRenderer(screen, board)
+    changed = []
+
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
+                print(textcache.report())
                 return
             elif event.type == pygame.KEYDOWN:
                 if game_over:
@@ -88,6 +157,10 @@ def main():
                     food.randomize_position()
                     score = 0
                     game_over = False
+                    board.fill(BLACK)
+                    snake.render(board, cell_size)
+                    food.render(board, cell_size)
+                    renderer.invalidate()
                 else:
                     if event.key == pygame.K_UP and snake.direction != (0, 1):
                         snake.direction = (0, -1)
@@ -101,27 +174,84 @@ def main():
         if not game_over:
             if not snake.update():
                 game_over = True
+            else:
+                if snake.removed:
+                    changed.append(board.fill(BLACK, cell_rect(snake.removed, cell_size)))
+                changed.append(draw_cell(board, GREEN, snake.get_head_position(), cell_size))
 
             if snake.get_head_position() == food.position:
                 snake.length += 1
                 score += 1
                 food.randomize_position()
+                if food.position:
+                    changed.append(draw_cell(board, RED, food.position, cell_size))
+
+        renderer.begin()
+        for rect in changed:
+            renderer.track(screen.blit(board, rect, rect))
+        changed.clear()
 
-        screen.fill(BLACK)
-        snake.render(screen)
-        food.render(screen)
-        
         # Display score
-        font = pygame.font.Font(None, 36)
-        score_text = font.render(f'Score: {score}', True, WHITE)
-        screen.blit(score_text, (10, 10))
-        
+        font = textcache.get_font(None, 36, system=False)
+        score_text = textcache.render(f'Score: {score}', font, WHITE)
+        renderer.track(screen.blit(score_text, (10, 10)))
+
         if game_over:
-            game_over_text = font.render('Game Over! Press any key to restart', True, WHITE)
-            screen.blit(game_over_text, (WINDOW_WIDTH//2 - 200, WINDOW_HEIGHT//2))
+            game_over_text = textcache.render('Game Over! Press any key to restart', font, WHITE)
+            renderer.track(screen.blit(game_over_text, (screen.get_width()//2 - 200, screen.get_height()//2)))
 
-        pygame.display.update()
+        renderer.end()
         clock.tick(10)
 
+def benchmark(width=1000, height=1000, length=500000, steps=2000):
+    # Grow a snake along a back-and-forth path over a big board, then time
+    # ticks (move, food check, incremental board update) at full length
+    cell_size = fit_cell_size(width, height)
+    board = pygame.Surface((width * cell_size, height * cell_size))
+    snake = Snake(width, height)
+    food = Food(snake)
+    snake.length = length
+
+    def turn():
+        x, y = snake.get_head_position()
+        going_right = y % 2 == 0
+        if (going_right and x == width - 1) or (not going_right and x == 0):
+            snake.direction = (0, 1)
+        else:
+            snake.direction = (1, 0) if going_right else (-1, 0)
+
+    def tick():
+        turn()
+        if not snake.update():
+            raise RuntimeError("snake ran into itself")
+        if snake.removed:
+            board.fill(BLACK, cell_rect(snake.removed, cell_size))
+        draw_cell(board, GREEN, snake.get_head_position(), cell_size)
+        if snake.get_head_position() == food.position:
+            food.randomize_position()
+
+    # Start in the top-left corner so the path never crosses itself
+    snake.vacate(snake.positions[0])
+    snake.positions[0] = (0, 0)
+    snake.occupy((0, 0))
+    start = time.perf_counter()
+    while len(snake.positions) < length:
+        tick()
+    grow = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(steps):
+        tick()
+    elapsed = time.perf_counter() - start
+    print(f"{width}x{height} board: grew to {len(snake.positions)} segments in {grow:.2f}s, "
+          f"then {elapsed / steps * 1e6:.1f} us per tick")
+
 if __name__ == '__main__':
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Snake")
+    parser.add_argument('--grid', nargs=2, type=int, metavar=('WIDTH', 'HEIGHT'), help="board size in cells")
+    parser.add_argument('--bench', action='store_true', help="time ticks with a very long snake instead of playing")
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(*(args.grid or (1000, 1000)))
+    else:
+        main(*(args.grid or (GRID_WIDTH, GRID_HEIGHT)))
@@ -1,33 +1,59 @@
-def sieve_of_eratosthenes(limit):
-    # Create boolean array for marking numbers
-    sieve = [True] * limit
-    sieve[0] = sieve[1] = False
-    
-    # Mark non-prime numbers in the sieve
-    for i in range(2, int(limit ** 0.5) + 1):
-        if sieve[i]:
-            for j in range(i * i, limit, i):
-                sieve[j] = False
-    
-    # Collect prime numbers
-    primes = []
-    for i in range(limit):
-        if sieve[i]:
-            primes.append(i)
-            if len(primes) == 2000:
-                return primes
-    return primes
-
-# Find first 2000 primes
-limit = 20000  # Initial estimate of range needed
-while True:
-    primes = sieve_of_eratosthenes(limit)
-    if len(primes) >= 2000:
-        # Write to file
-        with open('primes.txt', 'w') as f:
-            for i, prime in enumerate(primes[:2000], 1):
-                f.write(f"{i}. {prime}\n")
-        break
-    limit *= 2
-
-print(f"First 2000 prime numbers have been written to primes.txt")
+import argparse
+import multiprocessing
+import sys
+from sieve import SEGMENT_BYTES, first_primes, prime_segments
+
+# Write primes to a file: the first N primes (sieving up to the nth-prime
+# bound) or every prime in a range, one segment's worth per write. The
+# table format is the binary file read by primetable.py. With -j the
+# segments are sieved in parallel and written in order.
+
+FORMATS = {
+    'numbered': lambda start, primes: ''.join(f"{i}. {p}\n" for i, p in enumerate(primes, start)),
+    'plain': lambda start, primes: '\n'.join(map(str, primes)) + '\n' if primes else '',
+}
+
+
+def write_primes(out, chunks, line_format):
+    count = 0
+    for primes in chunks:
+        out.write(line_format(count + 1, primes))
+        count += len(primes)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write prime numbers to a file")
+    parser.add_argument('-n', type=int, default=2000, help="how many primes, starting from 2")
+    parser.add_argument('--range', nargs=2, type=int, metavar=('LOW', 'HIGH'), help="all primes in [LOW, HIGH) instead")
+    parser.add_argument('--format', choices=list(FORMATS) + ['table'], default='numbered')
+    parser.add_argument('--segment', type=int, default=SEGMENT_BYTES, help="odd numbers sieved per segment")
+    parser.add_argument('-o', '--output', default='primes.txt', help="output file, - for stdout")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="sieve in this many processes (0: one per core)")
+    args = parser.parse_args()
+    workers = args.workers or multiprocessing.cpu_count()
+
+    if args.range:
+        chunks = prime_segments(*args.range, args.segment, workers)
+    else:
+        chunks = first_primes(args.n, args.segment, workers)
+
+    if args.format == 'table':
+        import primetable
+        if args.output == '-' or (args.range and args.range[0] > 2):
+            parser.error("tables start at 2 and need a file to write to")
+        count = primetable.write_table(args.output, chunks, args.range[1] if args.range else None)
+    else:
+        out = sys.stdout if args.output == '-' else open(args.output, 'w', buffering=1 << 20)
+        with out:
+            count = write_primes(out, chunks, FORMATS[args.format])
+
+    if args.output != '-':
+        if args.range:
+            print(f"{count} primes in [{args.range[0]}, {args.range[1]}) have been written to {args.output}")
+        else:
+            print(f"First {count} prime numbers have been written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
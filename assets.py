@@ -0,0 +1,198 @@
+import json
+import os
+import time
+import pygame
+
+# Image asset manager. Each source image is decoded once, converted to the
+# display's pixel format, and every scaled variant is cached by size.
+# All variants a program uses can be baked into a single atlas PNG plus a
+# JSON manifest; later launches load that one file instead of decoding
+# each WebP/JPEG again. The atlas is rebuilt when a source file changes
+# or a new size is requested.
+
+ATLAS_IMAGE = 'atlas.png'
+ATLAS_MANIFEST = 'atlas.json'
+ATLAS_WIDTH = 1024
+
+
+def source_stamp(path):
+    # Cheap change detection for source images
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+def converted(surface, alpha):
+    if not pygame.display.get_surface():
+        return surface  # No display yet, nothing to convert to
+    return surface.convert_alpha() if alpha else surface.convert()
+
+
+def has_alpha(surface):
+    return bool(surface.get_flags() & pygame.SRCALPHA)
+
+
+def pack(sizes, width=ATLAS_WIDTH):
+    # Shelf packer: place rects left to right in rows, tallest first.
+    # Returns {key: (x, y)} and the atlas height.
+    positions = {}
+    x = y = shelf = 0
+    for key, (w, h) in sorted(sizes.items(), key=lambda item: -item[1][1]):
+        if x and x + w > width:
+            x, y, shelf = 0, y + shelf, 0
+        positions[key] = (x, y)
+        x += w
+        shelf = max(shelf, h)
+    return positions, y + shelf
+
+
+class AssetManager:
+    def __init__(self, atlas_image=ATLAS_IMAGE, atlas_manifest=ATLAS_MANIFEST):
+        self.atlas_image = atlas_image
+        self.atlas_manifest = atlas_manifest
+        self.images = {}  # name -> converted full-size surface
+        self.variants = {}  # (name, size) -> converted scaled surface
+        self.alpha = {}  # name -> whether the image has per-pixel alpha
+
+    def image(self, name):
+        surface = self.images.get(name)
+        if surface is None:
+            surface = pygame.image.load(name)
+            self.alpha[name] = has_alpha(surface)
+            surface = converted(surface, self.alpha[name])
+            self.images[name] = surface
+        return surface
+
+    def scaled(self, name, size):
+        key = (name, tuple(size))
+        surface = self.variants.get(key)
+        if surface is None:
+            surface = pygame.transform.scale(self.image(name), key[1])
+            self.variants[key] = surface
+        return surface
+
+    def load(self, sprites):
+        # Make every (name, size) in `sprites` available, from the atlas if
+        # it is current, otherwise from the sources (then bake a new atlas).
+        # `sprites` maps image file names to lists of (width, height).
+        if self.load_atlas(sprites):
+            return True
+        for name, sizes in sprites.items():
+            for size in sizes:
+                self.scaled(name, size)
+        try:
+            self.bake_atlas(sprites)
+        except (OSError, pygame.error):
+            pass  # Atlas directory not writable; the sprites are loaded, the next launch decodes the sources again
+        return False
+
+    def manifest_matches(self, manifest, sprites):
+        entries = manifest.get('entries', {})
+        sources = manifest.get('sources', {})
+        for name, sizes in sprites.items():
+            if sources.get(name) != source_stamp(name):
+                return False
+            for w, h in sizes:
+                if f"{name}@{w}x{h}" not in entries:
+                    return False
+        return True
+
+    def load_atlas(self, sprites):
+        try:
+            with open(self.atlas_manifest) as f:
+                manifest = json.load(f)
+            if not self.manifest_matches(manifest, sprites):
+                return False
+            atlas = pygame.image.load(self.atlas_image)
+        except (OSError, ValueError, pygame.error):
+            return False
+
+        atlas = converted(atlas, True)
+        for key, entry in manifest['entries'].items():
+            name = entry['name']
+            x, y, w, h = entry['rect']
+            alpha = entry['alpha']
+            # Copy out of the atlas so opaque sprites can drop the alpha channel
+            self.variants[(name, (w, h))] = converted(atlas.subsurface((x, y, w, h)).copy(), alpha)
+            self.alpha[name] = alpha
+        return True
+
+    def bake_atlas(self, sprites):
+        sizes = {}
+        for name, variant_sizes in sprites.items():
+            for w, h in variant_sizes:
+                sizes[f"{name}@{w}x{h}"] = (w, h)
+        width = max([ATLAS_WIDTH] + [w for w, _ in sizes.values()])
+        positions, height = pack(sizes, width)
+        atlas = pygame.Surface((width, height), pygame.SRCALPHA)
+
+        entries = {}
+        for key, (x, y) in positions.items():
+            name = key.rsplit('@', 1)[0]
+            w, h = sizes[key]
+            atlas.blit(self.scaled(name, (w, h)), (x, y))
+            entries[key] = {'name': name, 'rect': [x, y, w, h], 'alpha': self.alpha.get(name, False)}
+
+        pygame.image.save(atlas, self.atlas_image)
+        manifest = {
+            'sources': {name: source_stamp(name) for name in sprites},
+            'entries': entries,
+        }
+        with open(self.atlas_manifest, 'w') as f:
+            json.dump(manifest, f, indent=1)
+
+
+# Sprites used by 3.py, by source file and drawn size
+RPG_SPRITES = {
+    'Samurai.webp': [(50, 50), (300, 500)],
+    'archer.jpg': [(30, 30)],
+    'knight.webp': [(30, 30)],
+    'grass.jpg': [(800, 600)],
+}
+
+
+def benchmark(sprites=RPG_SPRITES, repeats=5):
+    # Compare loading every sprite from the sources against the baked atlas
+    pygame.display.set_mode((1, 1))
+
+    def timed(load):
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            load()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    def from_sources():
+        manager = AssetManager()
+        for name, sizes in sprites.items():
+            for size in sizes:
+                manager.scaled(name, size)
+
+    AssetManager().load(sprites)  # Make sure the atlas exists
+    source_ms = timed(from_sources)
+    atlas_ms = timed(lambda: AssetManager().load_atlas(sprites))
+
+    warm = AssetManager()
+    warm.load(sprites)
+    menu_ms = timed(lambda: warm.scaled('Samurai.webp', (300, 500)))
+    reload_ms = timed(lambda: pygame.transform.scale(pygame.image.load('Samurai.webp'), (300, 500)))
+    print(f"Cold start: {source_ms:.1f} ms from sources, {atlas_ms:.1f} ms from atlas")
+    print(f"Menu open: {reload_ms:.2f} ms decoding Samurai.webp, {menu_ms:.4f} ms from cache")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Bake or benchmark the sprite atlas")
+    parser.add_argument('command', choices=['bake', 'bench'])
+    args = parser.parse_args()
+    if args.command == 'bake':
+        pygame.display.set_mode((1, 1))
+        manager = AssetManager()
+        for name, sizes in RPG_SPRITES.items():
+            for size in sizes:
+                manager.scaled(name, size)
+        manager.bake_atlas(RPG_SPRITES)
+        print(f"Wrote {ATLAS_IMAGE} and {ATLAS_MANIFEST}")
+    else:
+        pygame.init()
+        benchmark()
@@ -0,0 +1,281 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import importlib.util
+import itertools
+import json
+import math
+import platform
+import statistics
+import subprocess
+import time
+import pygame
+import eventlog
+import gameplay
+import tree
+from engine import FrameInput, GameEngine
+
+# Scenario benchmarks for the game's hot loop. Each scenario builds a
+# situation from the real gameplay classes (many mobs, a boss fight, a sky
+# full of projectiles, a big talent tree), then times every phase of a tick
+# separately -- update, collision and render -- after a warmup. Results go
+# to a JSON file that can be compared against another run with --compare.
+
+PHASES = ('update', 'collision', 'render')
+IDLE = FrameInput()
+
+
+def load_rpg():
+    # 3.py holds the renderer but is not importable by name
+    spec = importlib.util.spec_from_file_location('rpg', os.path.join(os.path.dirname(__file__) or '.', '3.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.assets.load(module.RPG_SPRITES)
+    return module
+
+
+def quiet():
+    # Gameplay logs every hit; keep it out of the timings
+    return eventlog.muted()
+
+
+class Renderer:
+    def __init__(self, rpg):
+        self.rpg = rpg
+        scaled = rpg.assets.scaled
+        self.sprites = (scaled('grass.jpg', (rpg.WIDTH, rpg.HEIGHT)),
+                        scaled('Samurai.webp', (rpg.PLAYER_SIZE, rpg.PLAYER_SIZE)),
+                        scaled('archer.jpg', (rpg.MOB_SIZE, rpg.MOB_SIZE)),
+                        scaled('knight.webp', (rpg.MOB_SIZE, rpg.MOB_SIZE)))
+
+    def __call__(self, engine):
+        self.rpg.draw_frame(engine, *self.sprites)
+
+
+def make_engine(seed, swarm=False, batch_ai=False):
+    return GameEngine(seed=seed, swarm=swarm, batch_ai=batch_ai)
+
+
+def place_mobs(engine, mob_types, count):
+    spawn = engine.streams.stream('bench')
+    engine.mobs = [spawn.choice(mob_types)(spawn.randint(0, gameplay.WIDTH - gameplay.MOB_SIZE),
+                                           spawn.randint(0, gameplay.HEIGHT - gameplay.MOB_SIZE))
+                   for _ in range(count)]
+    engine.mob_grid.rebuild(engine.mobs)
+
+
+def engine_phases(engine, render, before_tick=None):
+    player = engine.player
+
+    def update():
+        if before_tick:
+            before_tick()
+        player.health = player.max_health  # Scenarios measure cost, not survival
+        engine.step_update(IDLE)
+
+    return {'update': update, 'collision': engine.check_collisions, 'render': lambda: render(engine)}
+
+
+def mob_scenario(mob_types):
+    def build(count, seed, render, swarm=False, batch_ai=False):
+        engine = make_engine(seed, swarm, batch_ai)
+        place_mobs(engine, mob_types, count)
+        return engine_phases(engine, render)
+    return build
+
+
+def boss_scenario(count, seed, render, swarm=False, batch_ai=False):
+    # A boss with hp to spare plus `count` mobs around it
+    engine = make_engine(seed, swarm, batch_ai)
+    place_mobs(engine, [gameplay.ShooterMob, gameplay.SwordMob], count)
+    engine.boss = gameplay.StrengthBoss(gameplay.WIDTH // 4, gameplay.HEIGHT // 4)
+    engine.boss.hp = engine.boss.max_hp = 10 ** 9
+    return engine_phases(engine, render)
+
+
+def projectile_scenario(count, seed, render, swarm=False, batch_ai=False):
+    # Keep `count` player projectiles in flight, topping up before each tick
+    engine = make_engine(seed, swarm, batch_ai)
+    place_mobs(engine, [gameplay.ShooterMob, gameplay.SwordMob], 25)
+    for mob in engine.mobs:
+        mob.hp = 10 ** 9
+    spawn = engine.streams.stream('bench')
+
+    def top_up():
+        missing = count - len(engine.projectiles)
+        if missing <= 0:
+            return
+        xs = [spawn.uniform(0, gameplay.WIDTH) for _ in range(missing)]
+        ys = [spawn.uniform(0, gameplay.HEIGHT) for _ in range(missing)]
+        angles = [spawn.uniform(0, 2 * math.pi) for _ in range(missing)]
+        if swarm:
+            engine.projectiles.spawn(xs, ys, [10 * math.cos(a) for a in angles], [10 * math.sin(a) for a in angles], 10)
+        else:
+            engine.projectiles.extend(gameplay.Projectile(x, y, a, 5) for x, y, a in zip(xs, ys, angles))
+
+    top_up()
+    return engine_phases(engine, render, top_up)
+
+
+def talent_tree_scenario(count, seed, render, swarm=False, batch_ai=False):
+    # Grow a tree to `count` nodes by learning breadth-first, then time
+    # hit-testing a click (update) and drawing the tree while panning (render)
+    tree.seed(seed)
+    roots, node_index = tree.generate_talent_tree()
+    player = tree.Player(roots)
+    player.talent_points = math.inf
+    frontier = list(roots)
+    while len(node_index) < count and frontier:
+        node = frontier.pop(0)
+        node.learnable = True
+        node.learn(player, node_index)
+        frontier.extend(child for child in node.children.values() if child)
+    surface = pygame.display.get_surface()
+    renderer = tree.TreeRenderer(node_index)
+    offset = [0, 0]
+    mouse = (403, 303)  # Hovering the root node at rest
+
+    def click():
+        if tree.handle_click(node_index, player, mouse, offset, 1.0):
+            renderer.invalidate()
+
+    frames = itertools.count()
+
+    def draw():
+        offset[0] = next(frames) * 3 % 600 - 300  # Keep dragging across the tree
+        renderer.draw(surface, offset, mouse, 1.0, player)
+        pygame.display.flip()
+
+    return {'update': click, 'render': draw}
+
+
+SCENARIOS = [
+    ('shooters', mob_scenario([gameplay.ShooterMob]), [25, 250]),
+    ('swordmobs', mob_scenario([gameplay.SwordMob]), [25, 250]),
+    ('boss', boss_scenario, [0, 25]),
+    ('projectiles', projectile_scenario, [100, 1000]),
+    ('talent_tree', talent_tree_scenario, [100, 1000]),
+]
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'mean_ms': statistics.fmean(ordered),
+        'p50_ms': percentile(ordered, 0.50),
+        'p95_ms': percentile(ordered, 0.95),
+        'p99_ms': percentile(ordered, 0.99),
+        'max_ms': ordered[-1],
+    }
+
+
+def run_scenario(phases, ticks, warmup):
+    samples = {name: [] for name in phases}
+    timer = time.perf_counter
+    for tick in range(warmup + ticks):
+        for name, phase in phases.items():
+            start = timer()
+            phase()
+            elapsed = (timer() - start) * 1000
+            if tick >= warmup:
+                samples[name].append(elapsed)
+    results = {name: summarize(values) for name, values in samples.items()}
+    results['total'] = summarize([sum(values) for values in zip(*samples.values())])
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    rpg = load_rpg()
+    render = Renderer(rpg)
+    selected = set(args.only or [name for name, _, _ in SCENARIOS])
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'machine': platform.machine(),
+            'ticks': args.ticks,
+            'warmup': args.warmup,
+            'swarm': args.swarm,
+            'batch_ai': args.batch_ai,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'scenarios': {},
+    }
+    for name, build, sizes in SCENARIOS:
+        if name not in selected:
+            continue
+        for size in args.sizes or sizes:
+            key = f"{name}-{size}"
+            with quiet():
+                phases = build(size, args.seed, render, swarm=args.swarm, batch_ai=args.batch_ai)
+                result = run_scenario(phases, args.ticks, args.warmup)
+            results['scenarios'][key] = result
+            line = "  ".join(f"{phase} {result[phase]['p50_ms']:.3f}/{result[phase]['p95_ms']:.3f}"
+                             for phase in PHASES if phase in result)
+            print(f"{key:<18} p50/p95 ms  {line}")
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"Wrote {args.out}")
+
+
+def compare(old_path, new_path, threshold):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'scenario':<18}{'phase':<11}{'old p50':>10}{'new p50':>10}{'change':>9}")
+    regressions = 0
+    for key, result in new['scenarios'].items():
+        before = old['scenarios'].get(key)
+        if not before:
+            continue
+        for phase in PHASES + ('total',):
+            if phase not in result or phase not in before:
+                continue
+            old_ms, new_ms = before[phase]['p50_ms'], result[phase]['p50_ms']
+            change = new_ms / old_ms - 1 if old_ms else 0
+            flag = '  REGRESSION' if change > threshold else ''
+            regressions += bool(flag)
+            print(f"{key:<18}{phase:<11}{old_ms:>10.3f}{new_ms:>10.3f}{change:>+9.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gameplay tick-cost benchmarks")
+    parser.add_argument('--ticks', type=int, default=300, help="measured ticks per scenario")
+    parser.add_argument('--warmup', type=int, default=30, help="ticks run before measuring")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', nargs='+', choices=[name for name, _, _ in SCENARIOS])
+    parser.add_argument('--sizes', nargs='+', type=int, help="override the scenario sizes")
+    parser.add_argument('--swarm', action='store_true', help="run the engine in NumPy swarm mode")
+    parser.add_argument('--batch-ai', action='store_true', help="run the engine with batched mob AI")
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two results files")
+    parser.add_argument('--threshold', type=float, default=0.10, help="p50 slowdown reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        raise SystemExit(1 if regressions else 0)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+import gameplay
+import tree
+
+# Memory and allocation benchmark for entity classes.
+#
+# Bytes per entity compares each slotted class against the same attributes
+# held in an ordinary __dict__ instance, which is what every class used
+# before __slots__. Room churn replays many room changes with and without
+# an EntityPool and counts the garbage collections they trigger.
+
+
+class DictEntity:
+    pass
+
+
+def entity_factories():
+    return [
+        ('ShooterMob', lambda: gameplay.ShooterMob(10, 10)),
+        ('SwordMob', lambda: gameplay.SwordMob(10, 10)),
+        ('Sword', lambda: gameplay.Sword(None, 40, 0)),
+        ('StrengthBoss', lambda: gameplay.StrengthBoss(10, 10)),
+        ('HealthPotion', lambda: gameplay.HealthPotion(10, 10)),
+        ('StatPotion', lambda: gameplay.StatPotion(10, 10, 'strength', 10)),
+        ('Bullet', lambda: gameplay.Bullet(10, 10, 1, 0)),
+        ('TalentNode', lambda: tree.TalentNode('strength', 3)),
+    ]
+
+
+def slot_names(cls):
+    names = []
+    for klass in cls.__mro__:
+        names.extend(getattr(klass, '__slots__', ()))
+    return names
+
+
+def as_dict_entity(entity):
+    # Same attribute values, stored the pre-__slots__ way
+    plain = DictEntity()
+    for name in slot_names(type(entity)):
+        if hasattr(entity, name):
+            setattr(plain, name, getattr(entity, name))
+    return plain
+
+
+def measure(make, count):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [make() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+def as_slotted_copy(entity):
+    # A fresh instance of the slotted class sharing the template's values,
+    # so both measurements count only the per-instance container
+    cls = type(entity)
+    copy = cls.__new__(cls)
+    for name in slot_names(cls):
+        if hasattr(entity, name):
+            setattr(copy, name, getattr(entity, name))
+    return copy
+
+
+def bytes_per_entity(count):
+    rows = []
+    for name, factory in entity_factories():
+        template = factory()
+        slotted = measure(lambda: as_slotted_copy(template), count)
+        plain = measure(lambda: as_dict_entity(template), count)
+        rows.append((name, plain, slotted))
+    return rows
+
+
+class GCCounter:
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.pause = 0.0
+        self.started = None
+
+    def __call__(self, phase, info):
+        if phase == 'start':
+            self.started = time.perf_counter()
+        else:
+            self.pause += time.perf_counter() - self.started
+            self.collections[info['generation']] += 1
+
+
+def room_churn(rooms, pooled):
+    # Build and throw away rooms the way GameEngine.change_room does
+    pool = gameplay.EntityPool() if pooled else None
+    counter = GCCounter()
+    gc.collect()
+    gc.callbacks.append(counter)
+    start = time.perf_counter()
+    mobs, potions = [], []
+    for _ in range(rooms):
+        if pool:
+            pool.release_all(mobs)
+            pool.release_all(potions)
+        mobs = gameplay.generate_mobs(25, 0, pool)
+        potions = [gameplay.spawn(pool, gameplay.HealthPotion, mob.rect.x, mob.rect.y) for mob in mobs[:3]]
+    elapsed = time.perf_counter() - start
+    gc.callbacks.remove(counter)
+    return elapsed, counter, pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entity memory and allocation benchmark")
+    parser.add_argument('--count', type=int, default=20000, help="instances per class for the size measurement")
+    parser.add_argument('--rooms', type=int, default=20000, help="room changes for the churn measurement")
+    args = parser.parse_args()
+    random.seed(0)
+
+    print(f"{'class':<14}{'__dict__ B':>12}{'__slots__ B':>13}{'saved':>8}")
+    for name, plain, slotted in bytes_per_entity(args.count):
+        print(f"{name:<14}{plain:>12.0f}{slotted:>13.0f}{1 - slotted / plain:>8.0%}")
+
+    print()
+    print(f"{'room churn':<14}{'time s':>10}{'gen0':>7}{'gen1':>7}{'gen2':>7}{'gc ms':>9}{'allocated':>11}{'reused':>9}")
+    for label, pooled in (('fresh', False), ('pooled', True)):
+        elapsed, counter, pool = room_churn(args.rooms, pooled)
+        allocated = pool.allocated if pool else '-'
+        reused = pool.reused if pool else '-'
+        gen0, gen1, gen2 = counter.collections
+        print(f"{label:<14}{elapsed:>10.2f}{gen0:>7}{gen1:>7}{gen2:>7}{counter.pause * 1000:>9.1f}{allocated:>11}{reused:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import pygame
+
+# Dirty-rectangle renderer. Instead of repainting the whole background and
+# flipping the full screen every frame, it restores the background only
+# under what was drawn last frame and pushes just those regions plus this
+# frame's drawings to the display.
+#
+# Usage per frame: begin(), draw everything passing the returned rects to
+# track(), then end(). Call invalidate() after anything that painted over
+# the whole window (menus, full-screen messages).
+
+
+class DirtyRectRenderer:
+    def __init__(self, surface, background):
+        self.surface = surface
+        self.background = background
+        self.screen_rect = surface.get_rect()
+        self.previous = []
+        self.current = []
+        self.full_redraw = True
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def begin(self):
+        if self.full_redraw:
+            self.surface.blit(self.background, (0, 0))
+        else:
+            background = self.background
+            for rect in self.previous:
+                self.surface.blit(background, rect, rect)
+        self.current = []
+
+    def track(self, rect):
+        # Record a drawn region; returns it so draw calls can be wrapped inline
+        clipped = rect.clip(self.screen_rect)
+        if clipped.w and clipped.h:
+            self.current.append(clipped)
+        return rect
+
+    def track_all(self, rects):
+        for rect in rects:
+            self.track(rect)
+
+    def end(self):
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.previous + self.current)
+        self.previous = self.current
@@ -0,0 +1,448 @@
+import math
+import time
+import pygame
+import gameplay
+from rng import RandomStreams
+from rooms import EXITS, Room, RoomManager
+from spatial import SpatialHash
+from swarm import Swarm, mob_rect_arrays
+
+# Display-free game engine. Runs the same update and collision logic as the
+# interactive loop in 3.py, but owns no window and no frame cap, so it can be
+# stepped as fast as the CPU allows for soak tests and balance runs.
+
+WIDTH, HEIGHT = gameplay.WIDTH, gameplay.HEIGHT
+PLAYER_SIZE = gameplay.PLAYER_SIZE
+FPS = 60
+PROJECTILE_SPEED = 10  # Same as gameplay.Projectile
+STAT_KEYS = ['strength', 'agility', 'intelligence', 'vitality']
+
+
+# Input for a single tick
+class FrameInput:
+    def __init__(self, dx=0, dy=0, fire=False, stats=()):
+        self.dx = dx
+        self.dy = dy
+        self.fire = fire
+        self.stats = stats  # Stat names to put a point into this tick
+
+def input_from_keys(keys):
+    # Translate pygame.key.get_pressed() into a FrameInput
+    dx, dy = 0, 0
+    if keys[pygame.K_LEFT]:
+        dx = -1
+    if keys[pygame.K_RIGHT]:
+        dx = 1
+    if keys[pygame.K_UP]:
+        dy = -1
+    if keys[pygame.K_DOWN]:
+        dy = 1
+    stat_keys = [pygame.K_1, pygame.K_2, pygame.K_3, pygame.K_4]
+    stats = tuple(stat for stat, key in zip(STAT_KEYS, stat_keys) if keys[key])
+    return FrameInput(dx, dy, keys[pygame.K_SPACE], stats)
+
+
+class GameEngine:
+    def __init__(self, clock=None, base_spawn_rate=5, swarm=False, batch_ai=False, seed=None, rooms=True,
+                 prefetch=False, pool=False):
+        # Without a clock the engine runs on simulated time, advancing one
+        # 60 FPS frame per step no matter how fast steps are executed.
+        # All randomness comes from streams derived from `seed` (a random
+        # one if not given), so the same seed and inputs give the same run.
+        # With swarm=True projectiles and bullets are stored in NumPy
+        # swarm.Swarm arrays instead of lists of objects. With batch_ai=True
+        # mobs and bosses are updated together by mobai.MobAI.
+        # With rooms=True each room is a cell of a rooms.RoomManager grid,
+        # generated from its own stream and restored when walked back into;
+        # prefetch=True generates the next rooms on a worker thread. With
+        # rooms=False every transition rolls a fresh room from the shared
+        # spawn stream, as input logs from before the room grid expect.
+        # pool=True recycles despawned mobs and potions through a
+        # gameplay.EntityPool; off by default, as allocating fresh ones
+        # benchmarks no slower (see bench_memory.py).
+        self.time_ms = 0
+        self.clock = clock
+        gameplay.use_clock(self.get_ticks)
+        self.streams = RandomStreams(seed)
+        gameplay.use_random_streams(self.streams)
+        self.boss_random = self.streams.stream('boss')
+        self.settings = {'base_spawn_rate': base_spawn_rate, 'swarm': swarm, 'batch_ai': batch_ai,
+                         'seed': self.streams.seed, 'rooms': rooms}
+        self.recorder = None  # Optional inputlog.InputRecorder
+        self.profiler = None  # Optional profiler.FrameProfiler, timing each phase of a tick
+
+        self.player = gameplay.Player()
+        self.level = 1
+        self.base_spawn_rate = base_spawn_rate
+        self.boss_encounters = 0
+        self.pool = gameplay.EntityPool() if pool else None
+        self.boss = None
+        self.bosses_unlocked = False
+        self.rooms = None
+        if rooms:
+            self.rooms = RoomManager(self.streams.seed, base_spawn_rate, self.pool, prefetch=prefetch)
+            self.room_cell = (0, 0)
+            room = self.rooms.enter(self.room_cell, self.boss_encounters, self.bosses_unlocked)
+            self.mobs, self.potions, self.boss = room.mobs, room.potions, room.boss
+        else:
+            self.mobs = gameplay.generate_mobs(self.base_spawn_rate, self.boss_encounters, self.pool)
+            self.potions = []
+        self.swarm = swarm
+        if swarm:
+            self.bullets = Swarm(gameplay.YELLOW)
+            self.projectiles = Swarm(gameplay.YELLOW)
+        else:
+            self.bullets = []
+            self.projectiles = []
+        self.ai = None
+        if batch_ai:
+            from mobai import MobAI
+            self.ai = MobAI(self.streams.numpy('batch_ai'))
+        self.running = True
+
+        # Broadphase indexes, kept in sync with the entity lists
+        self.mob_grid = SpatialHash()
+        self.mob_grid.rebuild(self.mobs)
+        self.bullet_grid = SpatialHash()
+        self.potion_grid = SpatialHash()
+        self.potion_grid.rebuild(self.potions)
+        self.bounds = pygame.Rect(0, 0, WIDTH, HEIGHT)  # Shots leaving this area are dropped
+        self.view = pygame.Rect(0, 0, WIDTH, HEIGHT)  # Part of the world on screen
+        self.ticks = 0
+        self.sword_end = self.player.sword.get_end_position()
+
+    def get_ticks(self):
+        if self.clock:
+            return self.clock()
+        return int(self.time_ms)
+
+    def close(self):
+        if self.rooms:
+            self.rooms.close()
+
+    def prefetch_rooms(self):
+        # The boss state decides what the next rooms hold; regenerate them when it changes
+        if self.rooms:
+            self.rooms.prefetch(self.room_cell, self.boss_encounters, self.bosses_unlocked)
+
+    def change_room(self, exit):
+        # Move through the `exit` edge of the screen ('left', 'right', 'up' or 'down')
+        self.level += 1
+        if self.rooms:
+            self.rooms.leave(self.room_cell, Room(self.mobs, self.potions, self.boss))
+            dx, dy = EXITS[exit]
+            self.room_cell = (self.room_cell[0] + dx, self.room_cell[1] + dy)
+            room = self.rooms.enter(self.room_cell, self.boss_encounters, self.bosses_unlocked)
+            self.mobs, self.potions, self.boss = room.mobs, room.potions, room.boss
+            self.mob_grid.rebuild(self.mobs)
+            self.potion_grid.rebuild(self.potions)
+            return
+
+        pool = self.pool
+        if pool:
+            pool.release_all(self.mobs)
+            pool.release_all(self.potions)
+        self.mobs = gameplay.generate_mobs(self.base_spawn_rate, self.boss_encounters, pool)
+        self.potions.clear()
+        self.potion_grid.clear()
+        if self.bosses_unlocked and self.boss_random.random() < 0.2:  # 20% chance to encounter a boss
+            boss_type = self.boss_random.choice(gameplay.BOSS_TYPES)
+            self.boss = gameplay.spawn(pool, boss_type, WIDTH // 2, HEIGHT // 2)
+            if pool:
+                pool.release_all(self.mobs)
+            self.mobs.clear()  # Clear mobs for boss encounter
+        self.mob_grid.rebuild(self.mobs)
+
+    def kill_mob(self, mob):
+        potion_count = len(self.potions)
+        self.mob_grid.remove(mob)
+        gameplay.handle_mob_death(mob, self.player, self.mobs, self.potions, self.pool)
+        for potion in self.potions[potion_count:]:
+            self.potion_grid.insert(potion)
+
+    def add_potion(self, potion):
+        self.potions.append(potion)
+        self.potion_grid.insert(potion)
+
+    def allocate_stat(self, stat):
+        # Spend one stat point between ticks, as the character menu does
+        if self.recorder:
+            self.recorder.record_menu(stat)
+        if self.player.stats['stat_points'] > 0:
+            self.player.distribute_stat_points(**{stat: 1})
+
+    def step(self, frame_input):
+        # Advance the game by one tick. Returns a list of event names
+        # ('bosses_unlocked', 'player_died') for the caller to present.
+        events = self.step_update(frame_input)
+        if self.running:
+            if self.profiler:
+                self.profiler.mark('collisions')
+            self.check_collisions()
+        return events
+
+    def step_update(self, frame_input):
+        # First half of a tick: input, movement, AI and shots. The player's
+        # contact, potion and sword checks follow in check_collisions().
+        events = []
+        player = self.player
+        profiler = self.profiler
+        if profiler:
+            profiler.mark('player')
+        if self.recorder:
+            self.recorder.record_tick(frame_input)
+        self.ticks += 1
+        self.time_ms += 1000 / FPS
+
+        launching_projectile = False
+        if frame_input.fire:
+            launching_projectile = self.fire()
+
+        for stat in frame_input.stats:
+            if player.stats['stat_points'] > 0:
+                player.distribute_stat_points(**{stat: 1})
+
+        player.move(frame_input.dx, frame_input.dy)
+        player.update_sword()
+        player.update(launching_projectile)
+
+        if profiler:
+            profiler.mark('projectiles')
+        if self.swarm:
+            self.update_projectile_swarm()
+        else:
+            self.update_projectiles()
+        if profiler:
+            profiler.mark('mobs')
+        self.check_room_transition()
+
+        # Check if player reaches level 5
+        if player.stats['level'] == 5 and not self.bosses_unlocked:
+            self.bosses_unlocked = True
+            self.prefetch_rooms()
+            events.append('bosses_unlocked')
+
+        self.update_boss()
+        self.update_mobs()
+        if profiler:
+            profiler.mark('bullets')
+        if self.swarm:
+            self.update_bullet_swarm()
+        else:
+            self.update_bullets()
+
+        # Check for player death
+        if player.health <= 0:
+            self.running = False
+            events.append('player_died')
+        return events
+
+    def fire(self):
+        player = self.player
+        if not self.swarm:
+            new_projectiles = player.launch_projectile()
+            self.projectiles.extend(new_projectiles)
+            return bool(new_projectiles)
+
+        pattern = player.launch_pattern()
+        if not pattern:
+            return False
+        points, angle = pattern
+        xs, ys = zip(*points)
+        self.projectiles.spawn(xs, ys, math.cos(angle) * PROJECTILE_SPEED, math.sin(angle) * PROJECTILE_SPEED,
+                               10 + player.stats['intelligence'] * 0.1)
+        return True
+
+    def update_projectile_swarm(self):
+        # Whole-array version of update_projectiles. Hits are resolved in
+        # shot order, so a shot passes over a mob an earlier shot has killed.
+        projectiles = self.projectiles
+        projectiles.move()
+        projectiles.cull_bounds(*self.bounds)
+        if self.mobs and len(projectiles):
+            mobs = list(self.mobs)
+            for index, damage in projectiles.collide(*mob_rect_arrays(mobs), [mob.hp for mob in mobs]):
+                mob = mobs[index]
+                mob.hp -= damage
+                if mob.hp <= 0:
+                    self.kill_mob(mob)
+        projectiles.compact()
+
+    def update_bullet_swarm(self):
+        bullets = self.bullets
+        bullets.move()
+        hits = bullets.hit_rect(self.player.rect)
+        if hits.any():
+            self.player.take_damage(10)
+            bullets.alive[:len(bullets)] &= ~hits
+        bullets.cull_bounds(*self.bounds)
+        bullets.compact()
+
+    def update_projectiles(self):
+        bounds = self.bounds
+        for projectile in self.projectiles[:]:
+            projectile.move()
+            x, y = projectile.rect.topleft
+            if x > bounds.right or x < bounds.x or y > bounds.bottom or y < bounds.y:
+                self.projectiles.remove(projectile)
+            else:
+                hits = self.mob_grid.query_rect(projectile.rect)
+                if hits:
+                    mob = hits[0]
+                    mob.hp -= projectile.damage
+                    self.projectiles.remove(projectile)
+                    if mob.hp <= 0:
+                        self.kill_mob(mob)
+
+    def check_room_transition(self):
+        rect = self.player.rect
+        if not self.boss:  # Only allow transition if no boss is present
+            if rect.x < 0:
+                rect.x = WIDTH - PLAYER_SIZE
+                self.change_room('left')
+            elif rect.x > WIDTH - PLAYER_SIZE:
+                rect.x = 0
+                self.change_room('right')
+            elif rect.y < 0:
+                rect.y = HEIGHT - PLAYER_SIZE
+                self.change_room('up')
+            elif rect.y > HEIGHT - PLAYER_SIZE:
+                rect.y = 0
+                self.change_room('down')
+        else:
+            # Restrict player movement within screen boundaries during boss fight
+            rect.x = max(0, min(rect.x, WIDTH - PLAYER_SIZE))
+            rect.y = max(0, min(rect.y, HEIGHT - PLAYER_SIZE))
+
+    def update_boss(self):
+        boss = self.boss
+        if boss:
+            player = self.player
+            if self.ai:
+                self.ai.update_bosses([boss], player)
+            else:
+                boss.update(player)
+            sword_end_x, sword_end_y = player.sword.get_end_position()
+            if boss.rect.clipline(player.rect.centerx, player.rect.centery, sword_end_x, sword_end_y):
+                boss.take_damage(0.1 * player.stats['strength'] + 2)
+            if boss.hp <= 0:
+                self.add_potion(gameplay.StatPotion(boss.rect.x, boss.rect.y, boss.stat_name, boss.stat_increase))
+                if self.pool:
+                    self.pool.release(boss)
+                self.boss = None  # Boss defeated
+                self.boss_encounters += 1
+                self.prefetch_rooms()
+
+    def add_bullet(self, bullet):
+        if self.swarm:
+            self.bullets.spawn(bullet.rect.x, bullet.rect.y, bullet.dx, bullet.dy, 10)
+        else:
+            self.bullets.append(bullet)
+            self.bullet_grid.insert(bullet)
+
+    def update_mobs(self):
+        # Update mobs and handle shooting
+        mob_grid = self.mob_grid
+        if self.ai:
+            (xs, ys, dxs, dys), extra_bullets = self.ai.update_mobs(self.mobs, self.player)
+            for mob in self.mobs:
+                mob_grid.update(mob)
+            if self.swarm:
+                speed = gameplay.BULLET_SPEED
+                self.bullets.spawn(xs, ys, dxs * speed, dys * speed, 10)
+            else:
+                for x, y, dx, dy in zip(xs.tolist(), ys.tolist(), dxs.tolist(), dys.tolist()):
+                    self.add_bullet(gameplay.Bullet(x, y, dx, dy))
+            for bullet in extra_bullets:
+                self.add_bullet(bullet)
+            return
+
+        for mob in self.mobs:
+            bullet = mob.update(self.player)
+            mob_grid.update(mob)
+            if bullet:
+                self.add_bullet(bullet)
+
+    def update_bullets(self):
+        player = self.player
+        bullet_grid = self.bullet_grid
+        for bullet in self.bullets:
+            bullet.move()
+            bullet_grid.update(bullet)
+
+        # Bullets hitting the player take priority over leaving the screen
+        dead = set()
+        for bullet in bullet_grid.query_rect(player.rect):
+            player.take_damage(10)
+            dead.add(bullet)
+        bounds = self.bounds
+        for bullet in self.bullets:
+            x, y = bullet.rect.topleft
+            if x < bounds.x or x > bounds.right or y < bounds.y or y > bounds.bottom:
+                dead.add(bullet)
+        if dead:
+            for bullet in dead:
+                bullet_grid.remove(bullet)
+            self.bullets = [bullet for bullet in self.bullets if bullet not in dead]
+
+    def check_collisions(self):
+        player = self.player
+        potions = self.potions
+
+        # Player body against mobs
+        for mob in self.mob_grid.query_rect(player.rect):
+            mob.hp -= player.stats['strength']
+            if mob.hp <= 0:
+                self.kill_mob(mob)
+
+        # Player against potions
+        for potion in self.potion_grid.query_rect(player.rect):
+            potion.apply(player)
+            potions.remove(potion)
+            self.potion_grid.remove(potion)
+            if self.pool:
+                self.pool.release(potion)
+
+        # Player sword against mobs
+        sword_end_x, sword_end_y = self.sword_end = player.sword.get_end_position()
+        for mob in self.mob_grid.query_segment(player.rect.centerx, player.rect.centery, sword_end_x, sword_end_y):
+            mob.hp -= 0.1 * player.stats['strength']
+            if mob.hp <= 0:
+                self.kill_mob(mob)
+
+
+# Simple bot for headless runs: wanders in a direction for a while, fires
+# whenever it can and spends stat points as soon as it gets them.
+def wander_policy(engine):
+    bot_random = engine.streams.stream('bot')
+    if engine.ticks % 90 == 0:
+        engine.wander = (bot_random.choice([-1, 0, 1]), bot_random.choice([-1, 0, 1]))
+    dx, dy = getattr(engine, 'wander', (1, 0))
+    stats = (bot_random.choice(STAT_KEYS),) if engine.player.stats['stat_points'] > 0 else ()
+    return FrameInput(dx, dy, True, stats)
+
+def run_headless(ticks, policy=wander_policy, engine=None, swarm=False, batch_ai=False, seed=None):
+    # Run up to `ticks` frames as fast as possible and return the engine
+    engine = engine or GameEngine(swarm=swarm, batch_ai=batch_ai, seed=seed)
+    while engine.running and engine.ticks < ticks:
+        engine.step(policy(engine))
+    return engine
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the RPG headless at uncapped speed")
+    parser.add_argument('--ticks', type=int, default=60 * 60 * 10, help="frames to simulate (default: 10 minutes)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--swarm', action='store_true', help="use NumPy arrays for projectiles and bullets")
+    parser.add_argument('--batch-ai', action='store_true', help="update mobs and bosses in NumPy batches")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = run_headless(args.ticks, swarm=args.swarm, batch_ai=args.batch_ai, seed=args.seed)
+    elapsed = time.perf_counter() - start
+    simulated = engine.ticks / FPS
+    print(f"Simulated {engine.ticks} ticks ({simulated:.0f}s of play) in {elapsed:.2f}s, "
+          f"{simulated / elapsed:.0f}x real-time")
+    print(f"Level {engine.player.stats['level']}, room {engine.level}, "
+          f"health {engine.player.health:.0f}, bosses beaten {engine.boss_encounters}")
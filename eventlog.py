@@ -0,0 +1,248 @@
+import atexit
+import json
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Structured game event log. Gameplay code builds small typed records
+# (damage, kill, level-up, loot, ...) instead of printing, and emit() only
+# appends them to an in-memory queue; a background thread formats them and
+# writes them to the console and, optionally, to a JSON lines file.
+#
+# Every event type has a level. The module-level `debug` and `info` flags
+# say whether events of that level go anywhere, and call sites check them
+# before building a record, so a disabled event costs one attribute read:
+#
+#     if eventlog.debug:
+#         eventlog.emit(Damage('player', amount, health))
+
+DEBUG, INFO, WARNING, OFF = 10, 20, 30, 100
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'off': OFF}
+FLUSH_INTERVAL = 0.25  # Seconds between background writes
+
+
+class Event:
+    __slots__ = ()
+    kind = 'event'
+    level = INFO
+
+    def fields(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def text(self):
+        return f"{self.kind}: {self.fields()}"
+
+
+class Damage(Event):
+    __slots__ = ('target', 'amount', 'health', 'source')
+    kind = 'damage'
+    level = DEBUG
+
+    def __init__(self, target, amount, health, source=None):
+        self.target = target
+        self.amount = amount
+        self.health = health
+        self.source = source
+
+    def text(self):
+        source = f" by {self.source}" if self.source else ""
+        return f"{self.target.capitalize()} hit{source}! Health: {self.health}"
+
+
+class Kill(Event):
+    __slots__ = ('mob', 'exp')
+    kind = 'kill'
+    level = DEBUG
+
+    def __init__(self, mob, exp):
+        self.mob = mob
+        self.exp = exp
+
+    def text(self):
+        return f"Killed {self.mob} for {self.exp} exp"
+
+
+class LevelUp(Event):
+    __slots__ = ('level_reached', 'stat_points')
+    kind = 'level_up'
+
+    def __init__(self, level_reached, stat_points):
+        self.level_reached = level_reached
+        self.stat_points = stat_points
+
+    def text(self):
+        return (f"Level up! You are now level {self.level_reached}. "
+                f"You have {self.stat_points} stat points to distribute.")
+
+
+class Loot(Event):
+    # A potion picked up: `stat` is 'health' for healing
+    __slots__ = ('item', 'stat', 'amount', 'value')
+    kind = 'loot'
+
+    def __init__(self, item, stat, amount, value):
+        self.item = item
+        self.stat = stat
+        self.amount = amount
+        self.value = value  # The stat's value afterwards
+
+    def text(self):
+        if self.stat == 'health':
+            return f"Health increased by {self.amount}! Current health: {self.value}"
+        return f"{self.stat.capitalize()} increased by {self.amount}!"
+
+
+class StatPoints(Event):
+    __slots__ = ('strength', 'agility', 'intelligence', 'vitality', 'remaining', 'health_increase', 'health')
+    kind = 'stat_points'
+
+    def __init__(self, strength, agility, intelligence, vitality, remaining, health_increase, health):
+        self.strength = strength
+        self.agility = agility
+        self.intelligence = intelligence
+        self.vitality = vitality
+        self.remaining = remaining
+        self.health_increase = health_increase
+        self.health = health
+
+    def text(self):
+        text = (f"Distributed points: STR {self.strength}, AGI {self.agility}, INT {self.intelligence}, "
+                f"VIT {self.vitality}. Remaining points: {self.remaining}")
+        if self.health_increase:
+            text = f"Health increased by {self.health_increase}! Current health: {self.health}\n" + text
+        return text
+
+
+class TalentLearned(Event):
+    __slots__ = ('stat', 'boost', 'rarity')
+    kind = 'talent'
+
+    def __init__(self, stat, boost, rarity):
+        self.stat = stat
+        self.boost = boost
+        self.rarity = rarity
+
+    def text(self):
+        return f"Learned {self.stat} node: +{self.boost} {self.stat}"
+
+
+class EventLog:
+    def __init__(self, console_level=INFO, console=None, json_path=None, json_level=DEBUG):
+        # console: a text stream, sys.stdout when None. Events below a
+        # sink's level are dropped for that sink.
+        self.console_level = console_level
+        self.console = console
+        self.json_file = open(json_path, 'a') if json_path else None
+        self.json_level = json_level if json_path else OFF
+        self.level = min(self.console_level, self.json_level)
+        self.queue = deque()
+        self.wake = threading.Event()
+        self.flushed = threading.Condition()
+        self.emitted = 0
+        self.written = 0  # Events handed to the sinks so far
+        self.closed = False
+        self.thread = None  # Writer, started by the first event
+
+    def emit(self, event):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='eventlog', daemon=True)
+            self.thread.start()
+        self.emitted += 1
+        self.queue.append((time.time(), event))
+
+    def run(self):
+        while not self.closed:
+            self.wake.wait(FLUSH_INTERVAL)
+            self.wake.clear()
+            self.write_pending()
+        self.write_pending()
+
+    def write_pending(self):
+        queue = self.queue
+        if not queue:
+            return
+        console = self.console or sys.stdout
+        lines, records = [], []
+        count = 0
+        while queue:
+            timestamp, event = queue.popleft()
+            count += 1
+            if event.level >= self.console_level:
+                lines.append(event.text())
+            if event.level >= self.json_level:
+                records.append(json.dumps({'time': timestamp, 'kind': event.kind, **event.fields()}))
+        if lines:
+            console.write('\n'.join(lines) + '\n')
+            console.flush()
+        if records:
+            self.json_file.write('\n'.join(records) + '\n')
+            self.json_file.flush()
+        with self.flushed:
+            self.written += count
+            self.flushed.notify_all()
+
+    def flush(self):
+        # Block until everything emitted so far has been written
+        if self.thread is None:
+            return
+        target = self.emitted
+        self.wake.set()
+        with self.flushed:
+            self.flushed.wait_for(lambda: self.written >= target or not self.thread.is_alive(), timeout=5)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        if self.thread:
+            self.thread.join()
+        if self.json_file:
+            self.json_file.close()
+
+
+# The game's log and its level flags
+log = None
+debug = info = False
+
+
+def configure(console_level=INFO, json_path=None, json_level=DEBUG, console=None):
+    # Replace the game's log, writing out whatever the old one still holds
+    global log, debug, info
+    if log:
+        log.close()
+    log = EventLog(console_level, console, json_path, json_level)
+    debug = log.level <= DEBUG
+    info = log.level <= INFO
+    return log
+
+
+def emit(event):
+    log.emit(event)
+
+
+def flush():
+    log.flush()
+
+
+@contextmanager
+def muted():
+    # Drop all events for the duration, e.g. while benchmarking
+    global debug, info
+    saved = debug, info
+    debug = info = False
+    try:
+        yield
+    finally:
+        debug, info = saved
+
+
+def shutdown():
+    if log:
+        log.close()
+
+
+configure()
+atexit.register(shutdown)
@@ -1,6 +1,7 @@
 import pygame
 import random
 import math
+import eventlog
 
 # Constants
 WIDTH, HEIGHT = 800, 600
@@ -16,6 +17,48 @@ YELLOW = (255, 255, 0)
 BLUE = (0, 0, 255)
 AURA_COLOR = (255, 255, 255, 50)  # Semi-transparent white
 POTION_COLOR = (0, 255, 255)
+SHOOT_CHANCE = 0.01  # Per frame chance a ShooterMob fires
+SWING_CHANCE = 0.05  # Per frame chance a SwordMob in range swings
+BULLET_SPEED = 7
+
+# Millisecond clock used for invincibility and regen timers.
+# The headless engine swaps this out for simulated time.
+get_ticks = pygame.time.get_ticks
+
+# Random sources per subsystem: mob spawning, mob AI rolls and loot drops.
+# They default to the global random module; use_random_streams() points
+# them at seeded rng.RandomStreams so runs can be reproduced.
+spawn_random = random
+ai_random = random
+loot_random = random
+
+def use_clock(clock):
+    global get_ticks
+    get_ticks = clock
+
+def use_random_streams(streams):
+    global spawn_random, ai_random, loot_random
+    spawn_random = streams.stream('spawn')
+    ai_random = streams.stream('ai')
+    loot_random = streams.stream('loot')
+
+# Values derived from the player's stats, with the stats each one reads.
+# They are cached on the player; set_stat() and add_stat() drop only the
+# values that depend on the stat being changed.
+DERIVED_STATS = {
+    'speed': (('agility',), lambda player: player.base_speed + player.stats['agility'] * 0.02),
+    'max_health': (('vitality',), lambda player: player.base_health + player.stats['vitality'] * 10),
+    'max_mana': (('intelligence',), lambda player: player.base_mana + player.stats['intelligence'] * 5),
+    'mana_regeneration': (('intelligence',), lambda player: 1 + player.stats['intelligence'] * 0.02),
+    # Sword speed and length: a little faster with agility, longer with the
+    # square root of strength, rounded up
+    'sword_speed': (('agility',), lambda player: max(0.05 + player.stats['agility'] * 0.0002, 0.2)),
+    'sword_length': (('strength',), lambda player: 50 + math.ceil(math.sqrt(player.stats['strength'] * 2500))*0.13),
+}
+DEPENDENT_STATS = {}
+for derived_name, (sources, _) in DERIVED_STATS.items():
+    for source in sources:
+        DEPENDENT_STATS.setdefault(source, []).append(derived_name)
 
 # Player class
 class Player:
@@ -36,48 +79,65 @@ class Player:
             'vitality': 500,
             'stat_points': 0
         }
+        self.derived = {}  # Cached DERIVED_STATS values
         self.health = self.max_health
         self.mana = self.max_mana
         self.sword = PlayerSword(self, 0)  # Initialize the player's sword
         self.invincible_time = 0
         self.damage_time = 0
-        self.last_mana_regen_time = pygame.time.get_ticks()  # Timer for mana regeneration
+        self.last_mana_regen_time = get_ticks()  # Timer for mana regeneration
+
+    def derived_stat(self, name):
+        value = self.derived.get(name)
+        if value is None:
+            value = self.derived[name] = DERIVED_STATS[name][1](self)
+        return value
+
+    def set_stat(self, stat, value):
+        # All stat changes go through here so cached values stay current
+        self.stats[stat] = value
+        for name in DEPENDENT_STATS.get(stat, ()):
+            self.derived.pop(name, None)
+
+    def add_stat(self, stat, amount):
+        self.set_stat(stat, self.stats[stat] + amount)
 
     @property
     def speed(self):
         # Speed increases with agility
-        return self.base_speed + self.stats['agility'] * 0.02
+        return self.derived_stat('speed')
 
     @property
     def max_health(self):
         # Max health increases with vitality
-        return self.base_health + self.stats['vitality'] * 10
+        return self.derived_stat('max_health')
 
     @property
     def max_mana(self):
         # Max mana increases with intelligence
-        return self.base_mana + self.stats['intelligence'] * 5
+        return self.derived_stat('max_mana')
 
     @property
     def mana_regeneration(self):
         # Mana regeneration rate
-        return 1 + self.stats['intelligence'] * 0.02
+        return self.derived_stat('mana_regeneration')
 
     def move(self, dx, dy):
         self.rect.x += dx * self.speed
         self.rect.y += dy * self.speed
 
-    def take_damage(self, amount):
-        current_time = pygame.time.get_ticks()
+    def take_damage(self, amount, source=None):
+        current_time = get_ticks()
         if current_time - self.invincible_time > 300:  # 0.3 seconds of invincibility
             self.health -= amount
             self.color = RED
             self.damage_time = current_time
             self.invincible_time = current_time
-            print(f"Player hit! Health: {self.health}")
+            if eventlog.debug:
+                eventlog.emit(eventlog.Damage('player', amount, self.health, source))
 
     def update(self, launching_projectile=False):
-        current_time = pygame.time.get_ticks()
+        current_time = get_ticks()
         if current_time - self.damage_time > 300:  # 0.3 seconds to revert color
             self.color = self.base_color
 
@@ -86,16 +146,15 @@ class Player:
             self.mana = min(self.max_mana, self.mana + self.mana_regeneration)
             self.last_mana_regen_time = current_time
 
-    def launch_projectile(self):
+    def launch_pattern(self):
+        # Spend mana and return the spawn points and movement angle of a volley,
+        # or None if there is not enough mana
         if self.mana >= 10:
             self.mana -= 10
             # Get the sword's end position and angle
             sword_end_x, sword_end_y = self.sword.get_end_position()
             sword_angle = self.sword.angle
 
-            # Create a list to store projectiles
-            projectiles = []
-
             # Define offsets for the staggered pattern, rotated by -90 degrees
             offsets = [
                 (0, 0),  # Center
@@ -105,67 +164,90 @@ class Player:
                 (-20, -20)  # Far bottom
             ]
 
-            # Use the sword's original angle for movement
-            movement_angle = sword_angle
-
-            # Generate projectiles in a rotated staggered pattern
+            # Generate spawn points in a rotated staggered pattern
+            points = []
             for offset_x, offset_y in offsets:
                 # Rotate the offset by the sword's angle minus 90 degrees
                 rotated_offset_x = offset_x * math.cos(sword_angle - math.pi / 2) - offset_y * math.sin(sword_angle - math.pi / 2)
                 rotated_offset_y = offset_x * math.sin(sword_angle - math.pi / 2) + offset_y * math.cos(sword_angle - math.pi / 2)
-                projectiles.append(Projectile(sword_end_x + rotated_offset_x, sword_end_y + rotated_offset_y, movement_angle, self.stats['intelligence']))
+                points.append((sword_end_x + rotated_offset_x, sword_end_y + rotated_offset_y))
+
+            # Use the sword's original angle for movement
+            return points, sword_angle
+        return None
 
-            return projectiles
+    def launch_projectile(self):
+        pattern = self.launch_pattern()
+        if pattern:
+            points, movement_angle = pattern
+            return [Projectile(x, y, movement_angle, self.stats['intelligence']) for x, y in points]
         return []
 
     def gain_exp(self, amount):
-        # Experience gain increases with intelligence
+        # Experience gain increases with intelligence. Returns the exp gained.
         exp_gain = amount + self.stats['intelligence'] * 0.1
-        self.stats['exp'] += exp_gain
+        self.add_stat('exp', exp_gain)
         if self.stats['exp'] >= self.stats['exp_to_next_level']:
-            self.stats['level'] += 1
-            self.stats['exp'] -= self.stats['exp_to_next_level']
-            self.stats['exp_to_next_level'] += 50  # Increase the exp needed for the next level
-            self.stats['stat_points'] += 5  # Gain stat points on level up
-            print(f"Level up! You are now level {self.stats['level']}. You have {self.stats['stat_points']} stat points to distribute.")
+            self.add_stat('level', 1)
+            self.add_stat('exp', -self.stats['exp_to_next_level'])
+            self.add_stat('exp_to_next_level', 50)  # Increase the exp needed for the next level
+            self.add_stat('stat_points', 5)  # Gain stat points on level up
+            if eventlog.info:
+                eventlog.emit(eventlog.LevelUp(self.stats['level'], self.stats['stat_points']))
+        return exp_gain
 
     def distribute_stat_points(self, strength=0, agility=0, intelligence=0, vitality=0):
         total_points = strength + agility + intelligence + vitality
         if self.stats['stat_points'] >= total_points:
-            self.stats['strength'] += strength
-            self.stats['agility'] += agility
-            self.stats['intelligence'] += intelligence
-            self.stats['vitality'] += vitality
-            self.stats['stat_points'] -= total_points
+            self.add_stat('strength', strength)
+            self.add_stat('agility', agility)
+            self.add_stat('intelligence', intelligence)
+            self.add_stat('vitality', vitality)
+            self.add_stat('stat_points', -total_points)
 
             # Increase current health based on vitality investment
+            health_increase = 0
             if vitality > 0:
                 health_increase = vitality * 10  # Assuming each point in vitality increases max health by 10
                 self.health = min(self.max_health, self.health + health_increase)
-                print(f"Health increased by {health_increase}! Current health: {self.health}")
 
-            print(f"Distributed points: STR {strength}, AGI {agility}, INT {intelligence}, VIT {vitality}. Remaining points: {self.stats['stat_points']}")
+            if eventlog.info:
+                eventlog.emit(eventlog.StatPoints(strength, agility, intelligence, vitality, self.stats['stat_points'],
+                                                  health_increase, self.health))
 
     def update_sword(self):
         self.sword.update()
 
 # Base Mob class
 class Mob:
+    __slots__ = ('rect', 'color', 'hp')
+
     def __init__(self, x, y, color, hp):
         self.rect = pygame.Rect(x, y, MOB_SIZE, MOB_SIZE)
         self.color = color
         self.hp = hp
 
+    def reset(self, x, y, color, hp):
+        # Return a recycled mob to its just-spawned state, keeping its rect
+        self.rect.topleft = (x, y)
+        self.color = color
+        self.hp = hp
+
     def update(self, player):
         pass
 
 # Shooter Mob class
 class ShooterMob(Mob):
+    __slots__ = ()
+
     def __init__(self, x, y):
         super().__init__(x, y, RED, 3)
 
+    def reset(self, x, y):
+        super().reset(x, y, RED, 3)
+
     def update(self, player):
-        if random.random() < 0.01:  # Random chance to shoot
+        if ai_random.random() < SHOOT_CHANCE:  # Random chance to shoot
             return self.shoot(player)
         return None
 
@@ -179,6 +261,8 @@ class ShooterMob(Mob):
 
 # Sword class
 class Sword:
+    __slots__ = ('mob', 'radius', 'angle', 'speed')
+
     def __init__(self, mob, radius, angle):
         self.mob = mob
         self.radius = radius
@@ -199,12 +283,18 @@ class Sword:
 
 # Sword Mob class
 class SwordMob(Mob):
+    __slots__ = ('swing_radius', 'sword', 'speed')
+
     def __init__(self, x, y):
         super().__init__(x, y, BLUE, 5)
         self.swing_radius = 40  # Radius of the sword swing
         self.sword = Sword(self, self.swing_radius, 0)  # Initialize the spinning sword
         self.speed = 2  # Speed of the SwordMob
 
+    def reset(self, x, y):
+        super().reset(x, y, BLUE, 5)
+        self.sword.angle = 0
+
     def update(self, player):
         # Move towards the player
         dx = player.rect.centerx - self.rect.centerx
@@ -221,27 +311,30 @@ class SwordMob(Mob):
         # Check for player collision with the spinning sword
         sword_x, sword_y = self.sword.get_position()
         if player.rect.collidepoint(sword_x, sword_y):
-            player.take_damage(5)  # Damage the player
-            print(f"Player hit by spinning sword! Health: {player.health}")
+            self.sword_hit(player)
 
         # Swing sword if player is within range
         if self.rect.colliderect(player.rect.inflate(self.swing_radius * 2, self.swing_radius * 2)):
-            if random.random() < 0.05:  # Random chance to swing
+            if ai_random.random() < SWING_CHANCE:  # Random chance to swing
                 self.swing_sword(player)
 
+    def sword_hit(self, player):
+        player.take_damage(5, 'spinning sword')  # Damage the player
+
     def swing_sword(self, player):
         # Check if player is within swing radius
         distance = math.hypot(player.rect.centerx - self.rect.centerx, player.rect.centery - self.rect.centery)
         if distance < self.swing_radius:
-            player.take_damage(5)  # Damage the player
-            print(f"Player hit by sword! Health: {player.health}")
+            player.take_damage(5, 'sword')  # Damage the player
 
 # Bullet class
 class Bullet:
+    __slots__ = ('rect', 'color', 'speed', 'dx', 'dy')
+
     def __init__(self, x, y, dx, dy):
         self.rect = pygame.Rect(x, y, BULLET_SIZE, BULLET_SIZE)
         self.color = YELLOW
-        self.speed = 7
+        self.speed = BULLET_SPEED
         self.dx = dx * self.speed
         self.dy = dy * self.speed
 
@@ -251,51 +344,97 @@ class Bullet:
 
 # Health Potion class
 class HealthPotion:
+    __slots__ = ('rect', 'color')
+
     def __init__(self, x, y):
         self.rect = pygame.Rect(x, y, POTION_SIZE, POTION_SIZE)
         self.color = POTION_COLOR
 
+    def reset(self, x, y):
+        self.rect.topleft = (x, y)
+
     def apply(self, player):
         # Increase the player's health by the heal amount, up to the max health
         new_health = min(player.max_health, player.health + 10 + player.stats['vitality'] * 0.5 )
         heal_amount = new_health - player.health
         player.health = new_health
-        print(f"Health increased by {heal_amount}! Current health: {player.health}")
-
+        if eventlog.info:
+            eventlog.emit(eventlog.Loot('health potion', 'health', heal_amount, player.health))
+
+
+# Free lists of despawned entities, so rooms and drops reuse instances
+# instead of allocating new ones
+class EntityPool:
+    def __init__(self, max_free=256):
+        self.max_free = max_free  # Per class
+        self.free = {}
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, cls, *args):
+        free = self.free.get(cls)
+        if free:
+            entity = free.pop()
+            entity.reset(*args)  # Reuses the instance's rect (and sword) in place
+            self.reused += 1
+            return entity
+        self.allocated += 1
+        return cls(*args)
+
+    def release(self, entity):
+        free = self.free.setdefault(type(entity), [])
+        if len(free) < self.max_free:
+            free.append(entity)
+
+    def release_all(self, entities):
+        for entity in entities:
+            self.release(entity)
+
+def spawn(pool, cls, *args):
+    return pool.acquire(cls, *args) if pool else cls(*args)
 
 # Generate mobs for a level
-def generate_mobs(base_spawn_rate, boss_encounters):
+def generate_mobs(base_spawn_rate, boss_encounters, pool=None, rng=None):
+    return [spawn(pool, mob_type, x, y) for mob_type, x, y in mob_spawns(base_spawn_rate, boss_encounters, rng)]
+
+def mob_spawns(base_spawn_rate, boss_encounters, rng=None):
+    # The (class, x, y) of each mob generate_mobs would create
     # Increase spawn rate based on the number of boss encounters
+    rng = rng or spawn_random
     spawn_rate = min(base_spawn_rate + boss_encounters * 2, 25)  # Example: 2 extra mobs per boss encounter
-    mobs = []
+    spawns = []
     for _ in range(spawn_rate):
-        x = random.randint(0, WIDTH - MOB_SIZE)
-        y = random.randint(0, HEIGHT - MOB_SIZE)
-        mob_type = random.choice([ShooterMob, SwordMob])
-        mobs.append(mob_type(x, y))
-    return mobs
-
-def handle_mob_death(mob, player, mobs, potions):
-    player.gain_exp(20)
+        x = rng.randint(0, WIDTH - MOB_SIZE)
+        y = rng.randint(0, HEIGHT - MOB_SIZE)
+        mob_type = rng.choice([ShooterMob, SwordMob])
+        spawns.append((mob_type, x, y))
+    return spawns
+
+def handle_mob_death(mob, player, mobs, potions, pool=None):
+    exp = player.gain_exp(20)
+    if eventlog.debug:
+        eventlog.emit(eventlog.Kill(type(mob).__name__, exp))
     mobs.remove(mob)
     # Drop a health potion with a very low chance
-    if random.random() < 0.05:  # 5% chance to drop a potion
-        potions.append(HealthPotion(mob.rect.x, mob.rect.y))
+    if loot_random.random() < 0.05:  # 5% chance to drop a potion
+        potions.append(spawn(pool, HealthPotion, mob.rect.x, mob.rect.y))
+    if pool:
+        pool.release(mob)
 
 class PlayerSword:
     def __init__(self, player, angle):
         self.player = player
         self.angle = angle
+        self.end_key = None  # Player centre, angle and length the cached end position is for
+        self.end = None
 
     @property
     def speed(self):
-        # Base speed plus a small increment based on agility
-        return max(0.05 + self.player.stats['agility'] * 0.0002, 0.2)
+        return self.player.derived_stat('sword_speed')
 
     @property
     def length(self):
-        # Sword length scales with the square root of strength, rounded up
-        return 50 + math.ceil(math.sqrt(self.player.stats['strength'] * 2500))*0.13
+        return self.player.derived_stat('sword_length')
 
     def update(self):
         # Update the angle for rotation using the calculated speed
@@ -304,12 +443,20 @@ class PlayerSword:
             self.angle -= 2 * math.pi
 
     def get_end_position(self):
-        # Calculate the sword's end position based on the angle and length
-        x = self.player.rect.centerx + self.length * math.cos(self.angle)
-        y = self.player.rect.centery + self.length * math.sin(self.angle)
-        return x, y
+        # Calculate the sword's end position based on the angle and length.
+        # Several checks read it each tick, so it is only recomputed once
+        # the player, the angle or the length has changed.
+        rect = self.player.rect
+        key = (rect.centerx, rect.centery, self.angle, self.length)
+        if key != self.end_key:
+            centerx, centery, angle, length = self.end_key = key
+            self.end = (centerx + length * math.cos(angle), centery + length * math.sin(angle))
+        return self.end
 
 class Boss(Mob):
+    __slots__ = ('max_hp', 'stat_increase', 'stat_name', 'base_color', 'invincible_time', 'damage_time')
+    speed = 1
+
     def __init__(self, x, y, color, hp, stat_increase, stat_name):
         super().__init__(x, y, color, hp)
         self.max_hp = hp
@@ -319,6 +466,15 @@ class Boss(Mob):
         self.invincible_time = 0
         self.damage_time = 0
 
+    def reset(self, x, y, color, hp, stat_increase, stat_name):
+        super().reset(x, y, color, hp)
+        self.max_hp = hp
+        self.stat_increase = stat_increase
+        self.stat_name = stat_name
+        self.base_color = color
+        self.invincible_time = 0
+        self.damage_time = 0
+
     def update(self, player):
         # Boss logic to move towards the player
         dx = player.rect.centerx - self.rect.centerx
@@ -326,16 +482,19 @@ class Boss(Mob):
         distance = math.hypot(dx, dy)
         if distance > 0:
             dx, dy = dx / distance, dy / distance
-            self.rect.x += dx * 1  # Boss speed
-            self.rect.y += dy * 1
+            self.rect.x += dx * self.speed
+            self.rect.y += dy * self.speed
+
+        self.update_blink()
 
+    def update_blink(self):
         # Handle blinking effect
-        current_time = pygame.time.get_ticks()
+        current_time = get_ticks()
         if current_time - self.damage_time > 200:  # 0.2 seconds to revert color
             self.color = self.base_color
 
     def take_damage(self, amount):
-        current_time = pygame.time.get_ticks()
+        current_time = get_ticks()
         if current_time - self.invincible_time > 500:  # 0.5 seconds of invincibility
             self.hp -= amount
             self.color = WHITE  # Change color to indicate damage
@@ -345,33 +504,66 @@ class Boss(Mob):
                 self.hp = 0
 
 class StrengthBoss(Boss):
+    __slots__ = ()
+
     def __init__(self, x, y):
         super().__init__(x, y, YELLOW, 50, 10, 'strength')
 
+    def reset(self, x, y):
+        super().reset(x, y, YELLOW, 50, 10, 'strength')
+
 class AgilityBoss(Boss):
+    __slots__ = ()
+
     def __init__(self, x, y):
         super().__init__(x, y, GREEN, 50, 10, 'agility')
 
+    def reset(self, x, y):
+        super().reset(x, y, GREEN, 50, 10, 'agility')
+
 class IntelligenceBoss(Boss):
+    __slots__ = ()
+
     def __init__(self, x, y):
         super().__init__(x, y, BLUE, 50, 10, 'intelligence')
 
+    def reset(self, x, y):
+        super().reset(x, y, BLUE, 50, 10, 'intelligence')
+
 class VitalityBoss(Boss):
+    __slots__ = ()
+
     def __init__(self, x, y):
         super().__init__(x, y, RED, 50, 10, 'vitality')
 
+    def reset(self, x, y):
+        super().reset(x, y, RED, 50, 10, 'vitality')
+
+BOSS_TYPES = [StrengthBoss, AgilityBoss, IntelligenceBoss, VitalityBoss]
+
 class StatPotion:
+    __slots__ = ('rect', 'color', 'stat_name', 'increase_amount')
+
     def __init__(self, x, y, stat_name, increase_amount):
         self.rect = pygame.Rect(x, y, POTION_SIZE, POTION_SIZE)
         self.color = POTION_COLOR
         self.stat_name = stat_name
         self.increase_amount = increase_amount
 
+    def reset(self, x, y, stat_name, increase_amount):
+        self.rect.topleft = (x, y)
+        self.stat_name = stat_name
+        self.increase_amount = increase_amount
+
     def apply(self, player):
-        player.stats[self.stat_name] += self.increase_amount
-        print(f"{self.stat_name.capitalize()} increased by {self.increase_amount}!")
+        player.add_stat(self.stat_name, self.increase_amount)
+        if eventlog.info:
+            eventlog.emit(eventlog.Loot('stat potion', self.stat_name, self.increase_amount,
+                                        player.stats[self.stat_name]))
 
 class Projectile:
+    __slots__ = ('rect', 'color', 'damage', 'speed', 'direction')
+
     def __init__(self, x, y, angle, intelligence):
         self.rect = pygame.Rect(x, y, BULLET_SIZE, BULLET_SIZE)
         self.color = YELLOW
@@ -388,6 +580,6 @@ class Projectile:
         self.rect.x += dx * self.speed
         self.rect.y += dy * self.speed
 
-    def draw(self, surface):
-        pygame.draw.rect(surface, self.color, self.rect)
+    def draw(self, surface, offset=(0, 0)):
+        return pygame.draw.rect(surface, self.color, self.rect.move(-offset[0], -offset[1]))
 
@@ -0,0 +1,158 @@
+import json
+from engine import FrameInput, GameEngine, STAT_KEYS
+
+# Compact input logs for GameEngine sessions. A log stores the engine
+# settings (including the RNG seed) and every tick's input, so replaying it
+# on a fresh engine with simulated time reproduces the session exactly.
+#
+# File layout: a magic line, one JSON line of engine settings, then binary
+# records. Runs of identical ticks are stored once with a repeat count:
+#   0, varint run, flags byte, stat count, stat indexes   -- tick input
+#   1, stat index                                         -- menu stat point
+# where flags = (dx + 1) | (dy + 1) << 2 | fire << 4.
+
+MAGIC = b'RPGINPUT1\n'
+TICK, MENU = 0, 1
+
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def input_key(frame_input):
+    return (frame_input.dx, frame_input.dy, bool(frame_input.fire), tuple(frame_input.stats))
+
+
+class InputRecorder:
+    def __init__(self, settings):
+        self.settings = settings
+        self.data = bytearray()
+        self.last = None  # (key, run) of the tick run being collected
+
+    def record_tick(self, frame_input):
+        key = input_key(frame_input)
+        if self.last and self.last[0] == key:
+            self.last[1] += 1
+        else:
+            self.flush_run()
+            self.last = [key, 1]
+
+    def record_menu(self, stat):
+        self.flush_run()
+        self.data.append(MENU)
+        self.data.append(STAT_KEYS.index(stat))
+
+    def flush_run(self):
+        if not self.last:
+            return
+        (dx, dy, fire, stats), run = self.last
+        self.data.append(TICK)
+        write_varint(self.data, run)
+        self.data.append((dx + 1) | (dy + 1) << 2 | fire << 4)
+        self.data.append(len(stats))
+        self.data.extend(STAT_KEYS.index(stat) for stat in stats)
+        self.last = None
+
+    def save(self, path):
+        self.flush_run()
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(json.dumps(self.settings).encode() + b'\n')
+            f.write(self.data)
+
+
+def load(path):
+    # Returns (settings, records), records being ('tick', FrameInput, run)
+    # or ('menu', stat) tuples in session order
+    with open(path, 'rb') as f:
+        if f.readline() != MAGIC:
+            raise ValueError(f"{path} is not an input log")
+        settings = json.loads(f.readline())
+        settings.setdefault('rooms', False)  # Logs from before the room grid
+        data = f.read()
+
+    records = []
+    pos = 0
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+        if tag == TICK:
+            run, pos = read_varint(data, pos)
+            flags, count = data[pos], data[pos + 1]
+            pos += 2
+            stats = tuple(STAT_KEYS[i] for i in data[pos:pos + count])
+            pos += count
+            frame_input = FrameInput((flags & 3) - 1, (flags >> 2 & 3) - 1, bool(flags & 16), stats)
+            records.append(('tick', frame_input, run))
+        elif tag == MENU:
+            records.append(('menu', STAT_KEYS[data[pos]]))
+            pos += 1
+        else:
+            raise ValueError(f"Corrupt input log at byte {pos - 1}")
+    return settings, records
+
+
+def replay_inputs(records):
+    # Flatten records into a stream of ('tick', FrameInput) / ('menu', stat)
+    for record in records:
+        if record[0] == 'tick':
+            for _ in range(record[2]):
+                yield 'tick', record[1]
+        else:
+            yield record
+
+
+def replay(path, engine=None):
+    # Re-run a recorded session headless and return the finished engine
+    settings, records = load(path)
+    engine = engine or GameEngine(**settings)
+    for kind, value in replay_inputs(records):
+        if not engine.running:
+            break
+        if kind == 'tick':
+            engine.step(value)
+        else:
+            engine.allocate_stat(value)
+    return engine
+
+
+def fingerprint(engine):
+    # Summary of engine state used to check that a replay matched
+    player = engine.player
+    return (engine.ticks, engine.level, engine.boss_encounters, tuple(player.rect),
+            round(player.health, 6), round(player.mana, 6), tuple(sorted(player.stats.items())),
+            tuple(tuple(mob.rect) for mob in engine.mobs))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Replay a recorded input log headless")
+    parser.add_argument('log')
+    parser.add_argument('--repeat', type=int, default=1, help="replay several times and check they agree")
+    args = parser.parse_args()
+
+    fingerprints = set()
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        engine = replay(args.log)
+        elapsed = time.perf_counter() - start
+        fingerprints.add(fingerprint(engine))
+        print(f"Replayed {engine.ticks} ticks in {elapsed:.2f}s; level {engine.player.stats['level']}, "
+              f"room {engine.level}, health {engine.player.health:.0f}")
+    if args.repeat > 1:
+        print("Replays identical" if len(fingerprints) == 1 else "Replays DIVERGED")
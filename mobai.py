@@ -0,0 +1,114 @@
+import math
+import numpy as np
+import gameplay
+from swarm import round_like_rect
+
+# Batched mob AI. Runs the per-frame logic of SwordMob.update,
+# ShooterMob.update and Boss.update for every mob of a type at once over
+# NumPy arrays: chase vectors, sword spin angles and tip positions, hit
+# tests and the random rolls for swinging and shooting. Side effects that
+# only a few mobs trigger in a frame (damaging the player) still go
+# through the mob's own methods so the rules stay in one place.
+
+TWO_PI = 2 * math.pi
+
+
+def rect_arrays(entities):
+    rects = np.array([(e.rect.x, e.rect.y, e.rect.w, e.rect.h) for e in entities], dtype=float).reshape(-1, 4)
+    return rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3]
+
+
+def chase(entities, speeds, player):
+    # Move every entity one step towards the player, rounding like pygame.Rect.
+    # Returns the new x, y and the width and height arrays.
+    x, y, w, h = rect_arrays(entities)
+    dx = player.rect.centerx - (x + w // 2)
+    dy = player.rect.centery - (y + h // 2)
+    distance = np.hypot(dx, dy)
+    moving = distance > 0  # Avoid division by zero
+    safe = np.where(moving, distance, 1)
+    new_x = np.where(moving, round_like_rect(x + (dx / safe) * speeds), x)
+    new_y = np.where(moving, round_like_rect(y + (dy / safe) * speeds), y)
+    for entity, ex, ey in zip(entities, new_x.tolist(), new_y.tolist()):
+        rect = entity.rect
+        rect.x = ex
+        rect.y = ey
+    return new_x, new_y, w, h
+
+
+def points_in_rect(px, py, rect):
+    # Vectorised Rect.collidepoint, which truncates float coordinates
+    px, py = np.trunc(px), np.trunc(py)
+    return (rect.x <= px) & (px < rect.right) & (rect.y <= py) & (py < rect.bottom)
+
+
+class MobAI:
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def update_sword_mobs(self, mobs, player):
+        if not mobs:
+            return
+        x, y, w, h = chase(mobs, np.array([mob.speed for mob in mobs], dtype=float), player)
+
+        # Spin the swords
+        swords = [mob.sword for mob in mobs]
+        angles = np.array([sword.angle for sword in swords]) + np.array([sword.speed for sword in swords])
+        angles = np.where(angles >= TWO_PI, angles - TWO_PI, angles)
+        for sword, angle in zip(swords, angles.tolist()):
+            sword.angle = angle
+
+        # Spinning sword tip against the player
+        radius = np.array([sword.radius for sword in swords], dtype=float)
+        tip_x = (x + w // 2) + radius * np.cos(angles)
+        tip_y = (y + h // 2) + radius * np.sin(angles)
+        for i in np.flatnonzero(points_in_rect(tip_x, tip_y, player.rect)).tolist():
+            mobs[i].sword_hit(player)
+
+        # Swing if the player is within range of the inflated player rect
+        reach = np.array([mob.swing_radius for mob in mobs], dtype=float)
+        target = player.rect
+        in_range = ((x < target.right + reach) & (target.x - reach < x + w)
+                    & (y < target.bottom + reach) & (target.y - reach < y + h))
+        swinging = in_range & (self.rng.random(len(mobs)) < gameplay.SWING_CHANCE)
+        for i in np.flatnonzero(swinging).tolist():
+            mobs[i].swing_sword(player)
+
+    def update_shooter_mobs(self, mobs, player):
+        # Returns arrays of bullet start x, y and unit direction dx, dy
+        if not mobs:
+            return np.empty(0), np.empty(0), np.empty(0), np.empty(0)
+        firing = np.flatnonzero(self.rng.random(len(mobs)) < gameplay.SHOOT_CHANCE)
+        if not len(firing):
+            return np.empty(0), np.empty(0), np.empty(0), np.empty(0)
+        x, y, w, h = rect_arrays([mobs[i] for i in firing.tolist()])
+        cx, cy = x + w // 2, y + h // 2
+        dx = player.rect.centerx - cx
+        dy = player.rect.centery - cy
+        distance = np.hypot(dx, dy)
+        aimed = distance > 0  # A mob exactly on the player's centre has no direction to shoot
+        return cx[aimed], cy[aimed], dx[aimed] / distance[aimed], dy[aimed] / distance[aimed]
+
+    def update_bosses(self, bosses, player):
+        if not bosses:
+            return
+        chase(bosses, np.array([boss.speed for boss in bosses], dtype=float), player)
+        for boss in bosses:
+            boss.update_blink()
+
+    def update_mobs(self, mobs, player):
+        # One AI tick for a mixed list of mobs. Returns the shooters' bullets
+        # as (x, y, dx, dy) arrays, plus a list of Bullet objects from mobs
+        # of any other type, which are updated one by one.
+        sword_mobs, shooter_mobs, others = [], [], []
+        for mob in mobs:
+            if isinstance(mob, gameplay.SwordMob):
+                sword_mobs.append(mob)
+            elif isinstance(mob, gameplay.ShooterMob):
+                shooter_mobs.append(mob)
+            else:
+                others.append(mob)
+        self.update_sword_mobs(sword_mobs, player)
+        bullets = self.update_shooter_mobs(shooter_mobs, player)
+        extra_bullets = [bullet for bullet in (mob.update(player) for mob in others) if bullet]
+        return bullets, extra_bullets
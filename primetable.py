@@ -0,0 +1,204 @@
+import mmap
+import struct
+from bisect import bisect_right
+from itertools import accumulate
+import numpy as np
+
+# Binary prime tables. 2 is implicit; the odd primes are stored as half
+# gaps, one byte each (a 0 byte escapes to a 2-byte half gap for gaps over
+# 510), in blocks of BLOCK primes. A sparse index at the end of the file
+# holds each block's first prime and the byte offset of its deltas, so a
+# query bisects the index and decodes at most one block straight from the
+# memory map.
+#
+# File layout: header (magic, prime count including 2, sieve limit, index
+# offset, block size), delta bytes, index of first primes (uint64), index
+# of block offsets (uint64). Every prime below the sieve limit is in the
+# table.
+
+MAGIC = b'PRIMTAB1'
+HEADER = struct.Struct('<8sQQQI4x')
+BLOCK = 256
+
+
+class TableWriter:
+    # Stream lists of consecutive primes, starting at 2, into a table file
+    def __init__(self, path, block=BLOCK):
+        self.file = open(path, 'wb')
+        self.block = block
+        self.file.write(bytes(HEADER.size))
+        self.position = HEADER.size
+        self.count = 0  # Odd primes written
+        self.last = None
+        self.has_two = False
+        self.firsts = []
+        self.offsets = []
+
+    def write(self, primes):
+        if primes and primes[0] == 2:
+            self.has_two = True
+            primes = primes[1:]
+        if not primes:
+            return
+        values = np.asarray(primes, dtype=np.int64)
+        previous = np.empty_like(values)
+        previous[0] = values[0] if self.last is None else self.last
+        previous[1:] = values[:-1]
+        halves = (values - previous) // 2  # The first odd prime gets a 0 half gap, never read
+        sizes = np.where(halves > 255, 3, 1)
+        ends = self.position + np.cumsum(sizes)  # Offset just past each prime's delta
+
+        # Index entries for primes starting a block
+        indexes = np.arange(self.count, self.count + len(values))
+        starts = np.flatnonzero(indexes % self.block == 0)
+        self.firsts.extend(values[starts].tolist())
+        self.offsets.extend(ends[starts].tolist())
+
+        if (sizes == 1).all():
+            data = halves.astype(np.uint8).tobytes()
+        else:
+            data = bytearray()
+            for half in halves.tolist():
+                if half > 255:
+                    data += b'\0' + struct.pack('<H', half)
+                else:
+                    data.append(half)
+        self.file.write(data)
+        self.position += len(data)
+        self.count += len(values)
+        self.last = primes[-1]
+
+    def close(self, limit=None):
+        # `limit`: the sieve limit, below which every prime was written
+        if limit is None:
+            limit = (self.last or 2) + 1
+        index_offset = self.position
+        self.file.write(np.array(self.firsts, dtype='<u8').tobytes())
+        self.file.write(np.array(self.offsets, dtype='<u8').tobytes())
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, self.count + self.has_two, limit, index_offset, self.block))
+        self.file.close()
+
+
+def write_table(path, chunks, limit=None, block=BLOCK):
+    writer = TableWriter(path, block)
+    count = 0
+    for primes in chunks:
+        writer.write(primes)
+        count += len(primes)
+    writer.close(limit)
+    return count
+
+
+class PrimeTable:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.limit, self.index_offset, self.block = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a prime table")
+        blocks = -(-(self.count - 1) // self.block)
+        view = memoryview(self.map)
+        self.firsts = view[self.index_offset:self.index_offset + 8 * blocks].cast('Q')
+        self.offsets = view[self.index_offset + 8 * blocks:self.index_offset + 16 * blocks].cast('Q')
+
+    def close(self):
+        self.firsts.release()
+        self.offsets.release()
+        self.map.close()
+
+    def __len__(self):
+        return self.count
+
+    def decode_block(self, block):
+        # The odd primes in one block
+        start = self.offsets[block]
+        end = self.offsets[block + 1] if block + 1 < len(self.offsets) else self.index_offset
+        data = self.map[start:end]
+        first = self.firsts[block]
+        if 0 not in data:
+            return [first + 2 * total for total in accumulate(data, initial=0)]
+        values = [first]
+        i = 0
+        while i < len(data):
+            half = data[i]
+            if half == 0:
+                half = data[i + 1] | data[i + 2] << 8
+                i += 3
+            else:
+                i += 1
+            values.append(values[-1] + 2 * half)
+        return values
+
+    def check(self, x):
+        if x >= self.limit:
+            raise ValueError(f"{x} is beyond the table, which covers numbers below {self.limit}")
+
+    def nth_prime(self, k):
+        # k-th prime, counting from nth_prime(1) == 2
+        if not 1 <= k <= self.count:
+            raise IndexError(f"the table holds primes 1 to {self.count}")
+        if k == 1:
+            return 2
+        block, i = divmod(k - 2, self.block)
+        return self.decode_block(block)[i]
+
+    def pi(self, x):
+        # Number of primes <= x
+        self.check(x)
+        if x < 3:
+            return int(x >= 2)
+        block = bisect_right(self.firsts, x) - 1
+        return 1 + block * self.block + bisect_right(self.decode_block(block), x)
+
+    def is_prime(self, x):
+        self.check(x)
+        if x < 3 or x % 2 == 0:
+            return x == 2
+        block = bisect_right(self.firsts, x) - 1
+        values = self.decode_block(block)
+        i = bisect_right(values, x)
+        return values[i - 1] == x
+
+    def next_prime(self, x):
+        # Smallest prime > x
+        if x < 2:
+            return 2
+        k = self.pi(x) + 1
+        if k > self.count:
+            raise ValueError(f"no prime after {x} in the table")
+        return self.nth_prime(k)
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+    parser = argparse.ArgumentParser(description="Query a binary prime table written by 2.py --format table")
+    parser.add_argument('table')
+    parser.add_argument('query', nargs='?', choices=['nth', 'pi', 'is_prime', 'next', 'bench'], default='bench')
+    parser.add_argument('value', nargs='?', type=int)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = PrimeTable(args.table)
+    opened = time.perf_counter() - start
+    if args.query == 'bench':
+        # Random lookups across the whole table, straight after opening it
+        rng = random.Random(1)
+        ks = [rng.randint(1, table.count) for _ in range(10000)]
+        xs = [rng.randrange(table.limit) for _ in range(10000)]
+        start = time.perf_counter()
+        for k in ks:
+            table.nth_prime(k)
+        nth_us = (time.perf_counter() - start) / len(ks) * 1e6
+        start = time.perf_counter()
+        for x in xs:
+            table.pi(x)
+        pi_us = (time.perf_counter() - start) / len(xs) * 1e6
+        print(f"{table.count} primes below {table.limit}: opened in {opened * 1000:.2f} ms, "
+              f"nth_prime {nth_us:.1f} us, pi {pi_us:.1f} us")
+    else:
+        query = {'nth': table.nth_prime, 'pi': table.pi, 'is_prime': table.is_prime, 'next': table.next_prime}
+        print(query[args.query](args.value))
+    table.close()
@@ -0,0 +1,162 @@
+import json
+import time
+from array import array
+import pygame
+import textcache
+
+# Per-phase frame profiler for the game loops. The loop calls mark(name)
+# as it enters each phase (input, AI, drawing, ...) and end_frame() once a
+# frame is done; every mark closes the previous phase, so a frame costs one
+# clock read per phase. The last `capacity` frames are kept in a ring
+# buffer of integer nanosecond timings, which feeds a live overlay (a
+# frame-time graph and the average time per phase) and can be written out
+# as Chrome trace-event JSON for chrome://tracing or Perfetto.
+
+CAPACITY = 600  # Frames kept, 10 seconds at 60 FPS
+MAX_PHASES = 16
+FRAME_BUDGET_NS = 1_000_000_000 // 60
+GRAPH_FRAMES = 120
+REFRESH_FRAMES = 30  # Frames between updates of the overlay's text
+PANEL_COLOR = (0, 0, 0, 170)
+BAR_COLOR = (80, 220, 80)
+SLOW_BAR_COLOR = (230, 60, 60)
+BUDGET_COLOR = (255, 255, 0)
+TEXT_COLOR = (255, 255, 255)
+TRACE_PATH = 'frame_trace.json'
+ZEROS = array('q', bytes(8 * MAX_PHASES))
+
+
+class FrameProfiler:
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.phases = {}  # name -> column, in the order first seen
+        self.durations = array('q', bytes(8 * capacity * MAX_PHASES))  # Per frame and phase
+        self.starts = array('q', bytes(8 * capacity))
+        self.ends = array('q', bytes(8 * capacity))
+        self.frames = 0  # Frames completed
+        self.row = 0  # Ring slot of the frame being timed
+        self.column = None  # Phase being timed, None between frames
+        self.start = self.last = 0
+        self.visible = False
+        self.lines = []  # Rendered overlay text, (label, value) surface pairs
+        self.lines_frame = None
+        self.panel = None  # Translucent overlay background, remade when its size changes
+
+    def mark(self, name):
+        now = time.perf_counter_ns()
+        column = self.phases.get(name)
+        if column is None:
+            if len(self.phases) == MAX_PHASES:
+                raise ValueError(f"more than {MAX_PHASES} profiler phases")
+            column = self.phases[name] = len(self.phases)
+        base = self.row * MAX_PHASES
+        if self.column is None:
+            self.start = now
+            self.durations[base:base + MAX_PHASES] = ZEROS
+        else:
+            self.durations[base + self.column] += now - self.last
+        self.column = column
+        self.last = now
+
+    def end_frame(self):
+        now = time.perf_counter_ns()
+        if self.column is None:
+            return
+        row = self.row
+        self.durations[row * MAX_PHASES + self.column] += now - self.last
+        self.starts[row] = self.start
+        self.ends[row] = now
+        self.frames += 1
+        self.row = self.frames % self.capacity
+        self.column = None
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def recent(self, count=None):
+        # Ring slots of the last `count` finished frames, oldest first
+        count = min(count or self.capacity, self.frames, self.capacity)
+        return [(self.frames - count + i) % self.capacity for i in range(count)]
+
+    def phase_times(self, row):
+        base = row * MAX_PHASES
+        return {name: self.durations[base + column] for name, column in self.phases.items()}
+
+    def breakdown(self, count=60):
+        # Average milliseconds per phase, and per frame, over the last `count` frames
+        rows = self.recent(count)
+        if not rows:
+            return {}, 0.0
+        totals = dict.fromkeys(self.phases, 0)
+        for row in rows:
+            for name, duration in self.phase_times(row).items():
+                totals[name] += duration
+        frame = sum(self.ends[row] - self.starts[row] for row in rows)
+        return {name: total / len(rows) / 1e6 for name, total in totals.items()}, frame / len(rows) / 1e6
+
+    def draw(self, surface, font):
+        # Draw the overlay in the top right corner and return its rect
+        rows = self.recent(GRAPH_FRAMES)
+        if self.lines_frame is None or self.frames - self.lines_frame >= REFRESH_FRAMES:
+            phases, frame = self.breakdown()
+            texts = [('frame ms', frame)] + list(phases.items())
+            # Values change at every refresh, so only the labels go through the shared cache
+            self.lines = [(textcache.render(name, font, TEXT_COLOR), font.render(f"{ms:.2f}", True, TEXT_COLOR))
+                          for name, ms in texts]
+            self.lines_frame = self.frames
+
+        graph_height = 60
+        line_height = font.get_linesize()
+        width = max([GRAPH_FRAMES * 2] + [label.get_width() + value.get_width() + 20
+                                          for label, value in self.lines]) + 10
+        height = graph_height + 15 + line_height * len(self.lines)
+        panel = pygame.Rect(surface.get_width() - width - 5, 5, width, height)
+        if self.panel is None or self.panel.get_size() != panel.size:
+            self.panel = pygame.Surface(panel.size, pygame.SRCALPHA)
+            self.panel.fill(PANEL_COLOR)
+        surface.blit(self.panel, panel)
+
+        # One bar per frame, the full graph height being two frame budgets
+        baseline = panel.y + 5 + graph_height
+        ns_per_pixel = 2 * FRAME_BUDGET_NS / graph_height
+        for i, row in enumerate(rows):
+            duration = self.ends[row] - self.starts[row]
+            x = panel.x + 5 + 2 * i
+            top = baseline - min(graph_height, int(duration / ns_per_pixel))
+            pygame.draw.line(surface, SLOW_BAR_COLOR if duration > FRAME_BUDGET_NS else BAR_COLOR,
+                             (x, baseline), (x, top))
+        budget_y = baseline - graph_height // 2
+        pygame.draw.line(surface, BUDGET_COLOR, (panel.x + 5, budget_y), (panel.x + 5 + 2 * GRAPH_FRAMES, budget_y))
+
+        y = baseline + 10
+        for label, value in self.lines:
+            surface.blit(label, (panel.x + 5, y))
+            surface.blit(value, (panel.right - 5 - value.get_width(), y))
+            y += line_height
+        return panel
+
+    def trace_events(self):
+        # Chrome trace events: a slice per frame with its phases nested
+        # inside. A phase marked more than once in a frame shows as one
+        # slice; slices follow the order the phases were first marked.
+        events = []
+        rows = self.recent()
+        if not rows:
+            return events
+        origin = self.starts[rows[0]]
+        for row in rows:
+            start = self.starts[row]
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': (start - origin) / 1000,
+                           'dur': (self.ends[row] - start) / 1000})
+            at = start
+            for name, duration in self.phase_times(row).items():
+                if duration:
+                    events.append({'name': name, 'ph': 'X', 'pid': 1, 'tid': 1, 'ts': (at - origin) / 1000,
+                                   'dur': duration / 1000})
+                    at += duration
+        return events
+
+    def dump(self, path=TRACE_PATH):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
+        return path
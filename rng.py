@@ -0,0 +1,26 @@
+import random
+
+# Seeded random streams, one per subsystem. Every stream is derived from a
+# single run seed plus the subsystem name, so a run can be reproduced from
+# its seed, and extra draws in one subsystem (say, loot) do not shift the
+# rolls of another (say, mob spawns).
+
+
+class RandomStreams:
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        self.seed = seed
+        self.streams = {}
+
+    def stream(self, name):
+        stream = self.streams.get(name)
+        if stream is None:
+            stream = random.Random(f"{self.seed}:{name}")
+            self.streams[name] = stream
+        return stream
+
+    def numpy(self, name):
+        # A NumPy Generator seeded from the named stream
+        import numpy as np
+        return np.random.default_rng(self.stream(name).getrandbits(64))
@@ -0,0 +1,115 @@
+import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import gameplay
+
+# Rooms on a grid. The player starts in room (0, 0) and each screen edge
+# leads to the neighbouring cell. A room's contents come from its own random
+# stream (run seed, cell, boss encounters so far, whether bosses are
+# unlocked), so a room generated ahead of time is the same room the player
+# would get by generating it on the spot.
+#
+# RoomManager rolls the four neighbours of the current room on a worker
+# thread while the player is in it. The worker only produces a room's
+# spawn list; the entities are taken from the engine's pool on the main
+# thread when the room is entered, so pooled mobs are still recycled.
+# Rooms the player leaves are kept, as they were left, in a small LRU cache
+# and restored when the player walks back into them.
+
+EXITS = {'left': (-1, 0), 'right': (1, 0), 'up': (0, -1), 'down': (0, 1)}
+BOSS_CHANCE = 0.2  # Chance a room holds a boss once bosses are unlocked
+CACHE_SIZE = 8  # Visited rooms kept
+
+
+class Room:
+    def __init__(self, mobs, potions, boss):
+        self.mobs = mobs
+        self.potions = potions
+        self.boss = boss
+
+    def entities(self):
+        return self.mobs + self.potions + ([self.boss] if self.boss else [])
+
+
+def plan_room(seed, cell, base_spawn_rate, boss_encounters, bosses_unlocked):
+    # What a room holds, as plain data: ([(mob class, x, y), ...], boss
+    # (class, x, y) or None). Touches no shared state, so it can run on the
+    # prefetch worker.
+    rng = random.Random(f"{seed}:room:{cell[0]},{cell[1]}:{boss_encounters}:{int(bosses_unlocked)}")
+    mobs = gameplay.mob_spawns(base_spawn_rate, boss_encounters, rng)
+    if bosses_unlocked and rng.random() < BOSS_CHANCE:
+        return [], (rng.choice(gameplay.BOSS_TYPES), gameplay.WIDTH // 2, gameplay.HEIGHT // 2)  # Boss rooms have no mobs
+    return mobs, None
+
+
+def build_room(plan, pool=None):
+    mob_spawns, boss_spawn = plan
+    mobs = [gameplay.spawn(pool, *mob_spawn) for mob_spawn in mob_spawns]
+    boss = gameplay.spawn(pool, *boss_spawn) if boss_spawn else None
+    return Room(mobs, [], boss)
+
+
+def generate_room(seed, cell, base_spawn_rate, boss_encounters, bosses_unlocked, pool=None):
+    return build_room(plan_room(seed, cell, base_spawn_rate, boss_encounters, bosses_unlocked), pool)
+
+
+class RoomManager:
+    def __init__(self, seed, base_spawn_rate, pool, cache_size=CACHE_SIZE, prefetch=True):
+        # Without prefetch, rooms are generated when they are entered
+        self.seed = seed
+        self.base_spawn_rate = base_spawn_rate
+        self.pool = pool
+        self.cache_size = cache_size
+        self.visited = OrderedDict()  # cell -> Room, least recently left first
+        self.pending = {}  # cell -> (generation key, Future of the room's plan) of prefetched rooms
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='rooms') if prefetch else None
+        self.restored = self.prefetched = self.generated = 0
+
+    def key(self, cell, boss_encounters, bosses_unlocked):
+        return (self.seed, cell, self.base_spawn_rate, boss_encounters, bosses_unlocked)
+
+    def enter(self, cell, boss_encounters, bosses_unlocked):
+        # The room at `cell`: as it was left, prefetched, or generated now
+        room = self.visited.pop(cell, None)
+        if room:
+            self.restored += 1
+        else:
+            key = self.key(cell, boss_encounters, bosses_unlocked)
+            key_and_future = self.pending.pop(cell, None)
+            if key_and_future and key_and_future[0] == key:
+                room = build_room(key_and_future[1].result(), self.pool)  # Waits only if the worker is still on it
+                self.prefetched += 1
+            else:
+                room = generate_room(*key, pool=self.pool)
+                self.generated += 1
+        self.prefetch(cell, boss_encounters, bosses_unlocked)
+        return room
+
+    def leave(self, cell, room):
+        self.visited[cell] = room
+        while len(self.visited) > self.cache_size:
+            _, evicted = self.visited.popitem(last=False)
+            if self.pool:
+                self.pool.release_all(evicted.entities())
+
+    def prefetch(self, cell, boss_encounters, bosses_unlocked):
+        # Start generating the unvisited neighbours of `cell`. Call again
+        # when the boss state changes, as that changes what they hold.
+        if not self.executor:
+            return
+        neighbours = set()
+        for dx, dy in EXITS.values():
+            neighbour = (cell[0] + dx, cell[1] + dy)
+            if neighbour in self.visited:
+                continue
+            neighbours.add(neighbour)
+            key = self.key(neighbour, boss_encounters, bosses_unlocked)
+            pending = self.pending.get(neighbour)
+            if not pending or pending[0] != key:
+                self.pending[neighbour] = (key, self.executor.submit(plan_room, *key))
+        for stale in self.pending.keys() - neighbours:
+            self.pending.pop(stale)[1].cancel()
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(cancel_futures=True)
@@ -0,0 +1,144 @@
+import math
+import multiprocessing
+import time
+from array import array
+from collections import deque
+from itertools import compress
+
+# Segmented sieve of Eratosthenes over odd numbers. Base primes up to
+# sqrt(high) are found once; the range is then sieved a cache-sized
+# bytearray segment at a time, byte i of a segment standing for the odd
+# number start + 2i. Memory stays at one segment plus the base primes
+# however far the sieve goes.
+#
+# With workers > 1 the segments are sieved in a process pool. Each worker
+# gets the base primes once when it starts, and the parent takes the
+# segments back in order. Only a few segments per worker are handed out
+# ahead of the one being taken back, so memory stays bounded when the
+# caller is slower than the pool.
+
+SEGMENT_BYTES = 1 << 18  # Odd numbers per segment
+IN_FLIGHT_PER_WORKER = 2  # Segments queued or sieved per worker
+
+
+def nth_prime_bound(n):
+    # Upper bound on the nth prime: n(ln n + ln ln n) holds for n >= 6
+    if n < 6:
+        return 13
+    return int(n * (math.log(n) + math.log(math.log(n)))) + 1
+
+
+def small_primes(limit):
+    # Primes below `limit` with a plain odd-only sieve
+    if limit <= 2:
+        return []
+    sieve = bytearray([1]) * (limit // 2)
+    sieve[0] = 0  # 1 is not prime
+    for i in range(1, (math.isqrt(limit - 1) - 1) // 2 + 1):
+        if sieve[i]:
+            p = 2 * i + 1
+            start = p * p // 2
+            sieve[start::p] = bytes(len(range(start, len(sieve), p)))
+    return [2] + list(compress(range(1, limit, 2), sieve))
+
+
+def sieve_segment(start, size, base, zeros):
+    # Primes among the `size` odd numbers from `start` (odd)
+    end = start + 2 * size
+    segment = bytearray([1]) * size
+    for p in base:
+        square = p * p
+        if square >= end:
+            break
+        first = max(square, (start + p - 1) // p * p)
+        if first % 2 == 0:
+            first += p
+        index = (first - start) // 2
+        if index < size:
+            segment[index::p] = zeros[:(size - 1 - index) // p + 1]
+    return list(compress(range(start, end, 2), segment))
+
+
+def segment_starts(low, high, segment_bytes):
+    # (start, size) of each segment covering the odd numbers in [low, high)
+    start = max(low, 3) | 1  # First odd number in range
+    while start < high:
+        size = min(segment_bytes, (high - start + 1) // 2)
+        yield start, size
+        start += 2 * size
+
+
+worker_base = worker_zeros = None
+
+
+def init_worker(base, segment_bytes):
+    global worker_base, worker_zeros
+    worker_base = base
+    worker_zeros = memoryview(bytes(segment_bytes))
+
+
+def sieve_in_worker(task):
+    # Primes travel back packed; a list of ints pickles far larger
+    return array('q', sieve_segment(*task, worker_base, worker_zeros))
+
+
+def prime_segments(low, high, segment_bytes=SEGMENT_BYTES, workers=1):
+    # Yield lists of the primes in [low, high), in order, one per segment
+    if low <= 2 < high:
+        yield [2]
+    base = small_primes(math.isqrt(max(high - 1, 0)) + 1)[1:]
+    tasks = segment_starts(low, high, segment_bytes)
+    if workers > 1:
+        with multiprocessing.Pool(workers, init_worker, (base, segment_bytes)) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.apply_async(sieve_in_worker, (task,)))
+                if len(pending) >= IN_FLIGHT_PER_WORKER * workers:
+                    yield pending.popleft().get().tolist()
+            while pending:
+                yield pending.popleft().get().tolist()
+    else:
+        zeros = memoryview(bytes(segment_bytes))
+        for start, size in tasks:
+            yield sieve_segment(start, size, base, zeros)
+
+
+def first_primes(n, segment_bytes=SEGMENT_BYTES, workers=1):
+    # Yield lists of primes totalling the first n primes
+    remaining = n
+    if remaining <= 0:
+        return
+    for primes in prime_segments(2, nth_prime_bound(n), segment_bytes, workers):
+        if len(primes) >= remaining:
+            yield primes[:remaining]
+            return
+        yield primes
+        remaining -= len(primes)
+
+
+def benchmark(limit=10 ** 9, max_workers=None, segment_bytes=SEGMENT_BYTES):
+    # Sieve [0, limit) with 1, 2, 4, ... workers and report primes per second
+    max_workers = max_workers or multiprocessing.cpu_count()
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    single = None
+    for workers in counts:
+        start = time.perf_counter()
+        total = sum(len(primes) for primes in prime_segments(0, limit, segment_bytes, workers))
+        elapsed = time.perf_counter() - start
+        single = single or elapsed
+        print(f"{workers:>3} worker(s): {total} primes below {limit} in {elapsed:.2f}s, "
+              f"{total / elapsed / 1e6:.2f}M primes/s, speedup {single / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Sieve throughput by worker count")
+    parser.add_argument('--limit', type=int, default=10 ** 9)
+    parser.add_argument('--workers', type=int, default=None, help="largest worker count to try (default: all cores)")
+    parser.add_argument('--segment', type=int, default=SEGMENT_BYTES)
+    args = parser.parse_args()
+    benchmark(args.limit, args.workers, args.segment)
@@ -0,0 +1,224 @@
+import multiprocessing
+import numpy as np
+from rng import RandomStreams
+
+# Headless, batched version of the Snake game in 1.py for agents. Every
+# board is a row of NumPy arrays: a ring buffer of body cells (head first),
+# per-cell occupancy counts, the direction and the food cell. step() moves
+# every snake at once with the same rules as Snake.update and the key
+# handler: wrap-around, no turning straight back, and death on any segment
+# other than the head and neck. Finished boards are reset automatically.
+#
+# ShardedSnakeEnv splits the boards over worker processes with the same
+# reset/step interface.
+
+GRID_WIDTH, GRID_HEIGHT = 40, 30  # 1.py's board
+UP, DOWN, LEFT, RIGHT = range(4)
+DX = np.array([0, 0, -1, 1])
+DY = np.array([-1, 1, 0, 0])
+OPPOSITE = np.array([DOWN, UP, RIGHT, LEFT])
+
+
+class SnakeEnv:
+    def __init__(self, num_envs, width=GRID_WIDTH, height=GRID_HEIGHT, seed=None, rng=None):
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.rng = rng if rng is not None else RandomStreams(seed).numpy('snake')
+        self.body = np.zeros((num_envs, self.cells), dtype=np.int32)  # Ring buffer of body cells
+        self.head_slot = np.zeros(num_envs, dtype=np.int64)  # Where the head sits in the ring
+        self.lengths = np.zeros(num_envs, dtype=np.int64)  # Segments on the board
+        self.targets = np.zeros(num_envs, dtype=np.int64)  # Snake.length: what the body grows to
+        self.occupancy = np.zeros((num_envs, self.cells), dtype=np.uint8)
+        self.directions = np.zeros(num_envs, dtype=np.int64)
+        self.food = np.zeros(num_envs, dtype=np.int64)  # -1 once a board is full
+        self.rows = np.arange(num_envs)
+        self.reset()
+
+    def reset(self, envs=None):
+        envs = self.rows if envs is None else envs
+        start = (self.height // 2) * self.width + self.width // 2
+        self.occupancy[envs] = 0
+        self.head_slot[envs] = 0
+        self.body[envs, 0] = start
+        self.occupancy[envs, start] = 1
+        self.lengths[envs] = 1
+        self.targets[envs] = 1
+        self.directions[envs] = RIGHT
+        self.spawn_food(envs)
+        return self.observe()
+
+    def spawn_food(self, envs):
+        # Uniform over free cells: draw cells and redraw the ones that hit
+        # the snake, falling back to listing free cells for crowded boards
+        pending = np.asarray(envs)
+        for _ in range(8):
+            if not len(pending):
+                return
+            cells = self.rng.integers(0, self.cells, len(pending))
+            free = self.occupancy[pending, cells] == 0
+            self.food[pending[free]] = cells[free]
+            pending = pending[~free]
+        for env in pending.tolist():
+            free = np.flatnonzero(self.occupancy[env] == 0)
+            self.food[env] = self.rng.choice(free) if len(free) else -1
+
+    def heads(self):
+        return self.body[self.rows, self.head_slot]
+
+    def observe(self):
+        heads = self.heads()
+        food = self.food
+        return {
+            'heads': np.stack([heads % self.width, heads // self.width], axis=1),
+            'directions': self.directions.copy(),
+            'food': np.where(food[:, None] >= 0, np.stack([food % self.width, food // self.width], axis=1), -1),
+            'lengths': self.lengths.copy(),
+        }
+
+    def boards(self):
+        # Occupancy counts as (envs, height, width)
+        return self.occupancy.reshape(self.num_envs, self.height, self.width)
+
+    def step(self, actions=None):
+        # actions: one direction per board (UP, DOWN, LEFT, RIGHT), or -1 to
+        # keep going. Returns (observation, rewards, dones); rewards are 1
+        # for eating and -1 for dying.
+        if actions is not None:
+            actions = np.asarray(actions)
+            turning = (actions >= 0) & (actions != OPPOSITE[self.directions])
+            self.directions = np.where(turning, actions, self.directions)
+
+        rows = self.rows
+        heads = self.body[rows, self.head_slot]
+        x = (heads % self.width + DX[self.directions]) % self.width
+        y = (heads // self.width + DY[self.directions]) % self.height
+        new = y * self.width + x
+
+        # Same rule as `new in positions[2:]`: segments on the cell other than the head and neck
+        necks = self.body[rows, (self.head_slot - 1) % self.cells]
+        others = (self.occupancy[rows, new].astype(np.int64) - (new == heads)
+                  - ((self.lengths > 1) & (new == necks)))
+        dones = others > 0
+        alive = rows[~dones]
+        new = new[alive]
+
+        popping = alive[self.lengths[alive] >= self.targets[alive]]
+        tails = self.body[popping, (self.head_slot[popping] - self.lengths[popping] + 1) % self.cells]
+        self.occupancy[popping, tails] -= 1
+        self.lengths[popping] -= 1
+
+        self.head_slot[alive] = (self.head_slot[alive] + 1) % self.cells
+        self.body[alive, self.head_slot[alive]] = new
+        self.occupancy[alive, new] += 1
+        self.lengths[alive] += 1
+
+        eaten = alive[new == self.food[alive]]
+        self.targets[eaten] += 1
+        self.spawn_food(eaten)
+
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        rewards[eaten] = 1
+        rewards[dones] = -1
+        if dones.any():
+            self.reset(rows[dones])
+        return self.observe(), rewards, dones
+
+    def positions(self, env):
+        # Body of one board as (x, y) cells, head first, like Snake.positions
+        slots = (self.head_slot[env] - np.arange(self.lengths[env])) % self.cells
+        return [(cell % self.width, cell // self.width) for cell in self.body[env, slots].tolist()]
+
+    def run_random(self, steps):
+        # Play random moves for `steps` ticks; returns (food eaten, deaths)
+        eaten = deaths = 0
+        for _ in range(steps):
+            _, rewards, dones = self.step(self.rng.integers(-1, 4, self.num_envs))
+            eaten += int((rewards > 0).sum())
+            deaths += int(dones.sum())
+        return eaten, deaths
+
+
+def shard_worker(connection, num_envs, width, height, seed, shard):
+    env = SnakeEnv(num_envs, width, height, rng=RandomStreams(seed).numpy(f'snake-shard{shard}'))
+    while True:
+        command, data = connection.recv()
+        if command == 'close':
+            break
+        connection.send(getattr(env, command)(*data))
+    connection.close()
+
+
+class ShardedSnakeEnv:
+    # SnakeEnv spread over worker processes, each owning a slice of the boards
+    def __init__(self, num_envs, workers=None, width=GRID_WIDTH, height=GRID_HEIGHT, seed=None):
+        workers = workers or multiprocessing.cpu_count()
+        if seed is None:
+            seed = RandomStreams().seed
+        self.num_envs = num_envs
+        self.splits = np.array_split(np.arange(num_envs), workers)
+        self.connections = []
+        self.processes = []
+        for shard, envs in enumerate(self.splits):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=shard_worker, args=(child, len(envs), width, height, seed, shard),
+                                              daemon=True)
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def call(self, command, shard_args):
+        for connection, args in zip(self.connections, shard_args):
+            connection.send((command, args))
+        return [connection.recv() for connection in self.connections]
+
+    def merge(self, observations):
+        return {key: np.concatenate([observation[key] for observation in observations]) for key in observations[0]}
+
+    def reset(self):
+        return self.merge(self.call('reset', [()] * len(self.connections)))
+
+    def step(self, actions=None):
+        if actions is None:
+            shard_args = [(None,)] * len(self.connections)
+        else:
+            actions = np.asarray(actions)
+            shard_args = [(actions[envs],) for envs in self.splits]
+        results = self.call('step', shard_args)
+        return (self.merge([observation for observation, _, _ in results]),
+                np.concatenate([rewards for _, rewards, _ in results]),
+                np.concatenate([dones for _, _, dones in results]))
+
+    def run_random(self, steps):
+        results = self.call('run_random', [(steps,)] * len(self.connections))
+        return sum(eaten for eaten, _ in results), sum(deaths for _, deaths in results)
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(('close', None))
+        for process in self.processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Batched Snake throughput")
+    parser.add_argument('--envs', type=int, default=4096)
+    parser.add_argument('--steps', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=0, help="worker processes (0 runs in this process)")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.workers:
+        env = ShardedSnakeEnv(args.envs, args.workers, seed=args.seed)
+    else:
+        env = SnakeEnv(args.envs, seed=args.seed)
+    start = time.perf_counter()
+    eaten, deaths = env.run_random(args.steps)
+    elapsed = time.perf_counter() - start
+    if args.workers:
+        env.close()
+    print(f"{args.envs} boards x {args.steps} steps in {elapsed:.2f}s: "
+          f"{args.envs * args.steps / elapsed / 1e6:.2f}M steps/s ({eaten} food, {deaths} deaths)")
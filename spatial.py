@@ -0,0 +1,133 @@
+from collections import defaultdict
+
+# Uniform-grid spatial hash for rect-shaped entities. Every entity with a
+# `rect` attribute is bucketed into each grid cell its rect overlaps, so
+# collision queries only look at entities near the query area instead of
+# scanning every entity in the room.
+
+CELL_SIZE = 64
+
+
+class SpatialHash:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(dict)
+        self.spans = {}  # entity -> (cx0, cy0, cx1, cy1) cell span it is bucketed in
+        self.order = {}  # entity -> insertion number, keeps query results in list order
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __contains__(self, entity):
+        return entity in self.spans
+
+    def span(self, rect):
+        cs = self.cell_size
+        return (rect.x // cs, rect.y // cs,
+                (rect.x + rect.w - 1) // cs, (rect.y + rect.h - 1) // cs)
+
+    def add_to_cells(self, entity, span):
+        cx0, cy0, cx1, cy1 = span
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                self.cells[(cx, cy)][entity] = None
+
+    def remove_from_cells(self, entity, span):
+        cx0, cy0, cx1, cy1 = span
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self.cells[(cx, cy)]
+                cell.pop(entity, None)
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def insert(self, entity):
+        span = self.span(entity.rect)
+        self.spans[entity] = span
+        self.order[entity] = self.counter
+        self.counter += 1
+        self.add_to_cells(entity, span)
+
+    def remove(self, entity):
+        span = self.spans.pop(entity, None)
+        if span is not None:
+            del self.order[entity]
+            self.remove_from_cells(entity, span)
+
+    def update(self, entity):
+        # Call after the entity's rect has moved. Only touches the buckets
+        # when the rect actually crossed into a different set of cells.
+        # An entity not in the hash yet is inserted.
+        old = self.spans.get(entity)
+        if old is None:
+            self.insert(entity)
+            return
+        new = self.span(entity.rect)
+        if old != new:
+            self.remove_from_cells(entity, old)
+            self.spans[entity] = new
+            self.add_to_cells(entity, new)
+
+    def rebuild(self, entities):
+        self.clear()
+        for entity in entities:
+            self.insert(entity)
+
+    def clear(self):
+        self.cells.clear()
+        self.spans.clear()
+        self.order.clear()
+        self.counter = 0
+
+    def sorted_candidates(self, candidates):
+        return sorted(candidates, key=self.order.__getitem__)
+
+    def query_rect(self, rect):
+        # Entities whose rect overlaps `rect`, in insertion order
+        cx0, cy0, cx1, cy1 = self.span(rect)
+        cells = self.cells
+        if cx0 == cx1 and cy0 == cy1:
+            # Common case for small entities: a single bucket, no dedup needed
+            cell = cells.get((cx0, cy0))
+            if not cell:
+                return []
+            hits = [entity for entity in cell if entity.rect.colliderect(rect)]
+            return self.sorted_candidates(hits) if len(hits) > 1 else hits
+        found = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        hits = [entity for entity in found if entity.rect.colliderect(rect)]
+        return self.sorted_candidates(hits) if len(hits) > 1 else hits
+
+    def segment_cells(self, x1, y1, x2, y2):
+        # Every cell the segment passes through, walked column by column.
+        # Padded by a pixel so float endpoints truncated by clipline still match.
+        cs = self.cell_size
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        for cx in range(int((x1 - 1) // cs), int((x2 + 1) // cs) + 1):
+            if x1 == x2:
+                ya, yb = y1, y2
+            else:
+                slope = (y2 - y1) / (x2 - x1)
+                ya = y1 + (min(max(x1, cx * cs), x2) - x1) * slope
+                yb = y1 + (max(min(x2, (cx + 1) * cs), x1) - x1) * slope
+            if ya > yb:
+                ya, yb = yb, ya
+            for cy in range(int((ya - 1) // cs), int((yb + 1) // cs) + 1):
+                yield cx, cy
+
+    def query_segment(self, x1, y1, x2, y2):
+        # Entities whose rect the segment (e.g. the player's sword) crosses, in insertion order
+        cells = self.cells
+        found = set()
+        for key in self.segment_cells(x1, y1, x2, y2):
+            cell = cells.get(key)
+            if cell:
+                found.update(cell)
+        hits = [entity for entity in found if entity.rect.clipline(x1, y1, x2, y2)]
+        return self.sorted_candidates(hits) if len(hits) > 1 else hits
@@ -0,0 +1,143 @@
+import numpy as np
+import pygame
+
+# Struct-of-arrays storage for large numbers of small shots (player
+# projectiles, mob bullets). Positions, velocities, damage and alive flags
+# live in preallocated NumPy arrays and are moved, culled and hit-tested as
+# whole-array operations instead of one Python object per shot.
+
+SHOT_SIZE = 5
+
+
+def round_like_rect(values):
+    # pygame.Rect rounds half away from zero when a float is assigned to x/y
+    return np.trunc(values + np.copysign(0.5, values))
+
+
+class Swarm:
+    def __init__(self, color, size=SHOT_SIZE, capacity=1024):
+        self.color = color
+        self.size = size
+        self.count = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.damage = np.zeros(capacity)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.sprite = pygame.Surface((size, size))
+        self.sprite.fill(color)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.x)
+
+    def grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name in ('x', 'y', 'vx', 'vy', 'damage', 'alive'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, xs, ys, vxs, vys, damage):
+        # Add shots; arguments may be scalars or arrays of equal length
+        xs = np.atleast_1d(np.asarray(xs, dtype=float))
+        n = len(xs)
+        start, end = self.count, self.count + n
+        if end > self.capacity:
+            self.grow(end)
+        self.x[start:end] = np.trunc(xs)  # pygame.Rect truncates on construction
+        self.y[start:end] = np.trunc(ys)
+        self.vx[start:end] = vxs
+        self.vy[start:end] = vys
+        self.damage[start:end] = damage
+        self.alive[start:end] = True
+        self.count = end
+
+    def move(self):
+        n = self.count
+        self.x[:n] = round_like_rect(self.x[:n] + self.vx[:n])
+        self.y[:n] = round_like_rect(self.y[:n] + self.vy[:n])
+
+    def cull_bounds(self, left, top, width, height):
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        self.alive[:n] &= (x >= left) & (x <= left + width) & (y >= top) & (y <= top + height)
+
+    def collide(self, rx, ry, rw, rh, hp):
+        # Resolve hits in shot order, as shot objects checked one at a time
+        # would: each live shot hits the first rect it overlaps whose hit
+        # points (`hp`, one per rect) are still above zero, dies, and takes
+        # its damage off that rect, so a rect brought to zero stops absorbing
+        # shots. Rects are given as arrays of left, top, width and height.
+        # Returns the (rect index, damage) of each hit, in the order they
+        # land; `hp` itself is not modified.
+        n = self.count
+        if n == 0 or len(rx) == 0:
+            return []
+        live = np.flatnonzero(self.alive[:n])
+        x = self.x[live, None]
+        y = self.y[live, None]
+        size = self.size
+        overlap = (x < rx + rw) & (rx < x + size) & (y < ry + rh) & (ry < y + size)
+        hitting = np.flatnonzero(overlap.any(axis=1))
+        hits = []
+        if not len(hitting):
+            return hits
+        hp = list(hp)
+        for row in hitting.tolist():
+            for index in np.flatnonzero(overlap[row]).tolist():
+                if hp[index] > 0:
+                    shot = live[row]
+                    damage = self.damage[shot].item()
+                    hp[index] -= damage
+                    self.alive[shot] = False
+                    hits.append((index, damage))
+                    break
+        return hits
+
+    def hit_rect(self, rect):
+        # Mask of live shots overlapping a single rect
+        n = self.count
+        x, y, size = self.x[:n], self.y[:n], self.size
+        return (self.alive[:n] & (x < rect.right) & (rect.x < x + size)
+                & (y < rect.bottom) & (rect.y < y + size))
+
+    def compact(self):
+        # Drop dead shots, keeping the survivors in spawn order
+        n = self.count
+        keep = np.flatnonzero(self.alive[:n])
+        m = len(keep)
+        if m == n:
+            return
+        for name in ('x', 'y', 'vx', 'vy', 'damage', 'alive'):
+            array = getattr(self, name)
+            array[:m] = array[keep]
+        self.alive[m:n] = False
+        self.count = m
+
+    def clear(self):
+        self.alive[:self.count] = False
+        self.count = 0
+
+    def positions(self, offset=(0, 0)):
+        # Batched view for drawing: an (n, 2) int array of top-left corners,
+        # less `offset` (the camera position)
+        n = self.count
+        return np.stack((self.x[:n] - offset[0], self.y[:n] - offset[1]), axis=1).astype(int)
+
+    def draw(self, surface, doreturn=False, offset=(0, 0)):
+        sprite = self.sprite
+        return surface.blits([(sprite, (x, y)) for x, y in self.positions(offset).tolist()], doreturn=doreturn)
+
+
+def mob_rect_arrays(mobs):
+    # Left, top, width and height arrays for a list of entities
+    rects = np.array([(m.rect.x, m.rect.y, m.rect.w, m.rect.h) for m in mobs], dtype=float).reshape(-1, 4)
+    return rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3]
@@ -0,0 +1,277 @@
+import mmap
+import os
+import struct
+import numpy as np
+import tree
+
+# Binary save files for the talent tree. A save holds the generation seed,
+# the player's points and stats, and one fixed-size record for every node
+# the player has touched (learned or learnable nodes, or ones that were
+# until a respec). Everything else regenerates from the seed.
+#
+# File layout: a header, then records sorted by lattice cell, then records
+# appended by later incremental saves.
+#   header: magic, seed, talent points, 4 stats, 4 additional points,
+#           record count, sorted record count
+#   record: column, row (int32, grid steps from the root), stat id, boost,
+#           flags (1 rare, 2 learned, 4 learnable), direction to the parent
+#
+# Loading maps the file and reads the records in place; a TalentNode is
+# only built when the tree looks up its cell. Saving writes the records
+# of the nodes learn and respec touched since the last save (the player's
+# `changed` nodes), in place or at the end of the file, then the header;
+# the file is rewritten sorted once the unsorted tail grows.
+
+MAGIC = b'RPGTREE1'
+HEADER = struct.Struct('<8sQq4q4qII')
+RECORD = np.dtype([('column', '<i4'), ('row', '<i4'), ('stat', 'u1'), ('boost', 'u1'),
+                   ('flags', 'u1'), ('parent', 'u1')])
+RARE, LEARNED, LEARNABLE = 1, 2, 4
+NO_PARENT = 255
+DIRECTION_NAMES = list(tree.DIRECTIONS)
+OPPOSITE = {'up': 'down', 'down': 'up', 'left': 'right', 'right': 'left'}
+MIN_TAIL = 1024  # Appended records tolerated before the file is re-sorted
+
+
+def cell_key(column, row):
+    return column << 32 | (row & 0xffffffff)
+
+
+def record_of(node, parent_direction):
+    column, row = tree.lattice_cell(node.position)
+    flags = (RARE if node.rarity == 'rare' else 0) | (LEARNED if node.learned else 0) \
+        | (LEARNABLE if node.learnable else 0)
+    parent = NO_PARENT if parent_direction is None else DIRECTION_NAMES.index(parent_direction)
+    return (column, row, tree.STATS.index(node.stat), node.boost, flags, parent)
+
+
+def parent_direction(node, node_index):
+    # Direction from the node to its parent, if the parent is in memory
+    parent, direction = tree.parent_of(node, node_index)
+    return OPPOSITE[direction] if parent else None
+
+
+def node_position(column, row):
+    return (tree.ROOT_POSITION[0] + column * tree.GRID_SPACING, tree.ROOT_POSITION[1] + row * tree.GRID_SPACING)
+
+
+def write_file(path, header, records):
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(header)
+        f.write(records.tobytes())
+    os.replace(temporary, path)
+
+
+def header_for(player, count, sorted_count):
+    stats = [player.stats[stat] for stat in tree.STATS]
+    additional = [player.additional_points[stat] for stat in tree.STATS]
+    return HEADER.pack(MAGIC, tree.talent_seed & tree.MASK, player.talent_points, *stats, *additional,
+                       count, sorted_count)
+
+
+def create(path, node_index, player):
+    # Write a complete save of the tree in memory and open it
+    records = np.array([record_of(node, parent_direction(node, node_index)) for node in node_index.values()
+                        if node.learned or node.learnable], dtype=RECORD)
+    records = records[np.argsort(cell_key(records['column'].astype(np.int64), records['row'].astype(np.int64)))]
+    write_file(path, header_for(player, len(records), len(records)), records)
+    player.changed.clear()
+    return TalentStore(path)
+
+
+class TalentStore:
+    def __init__(self, path):
+        self.path = path
+        self.player = None
+        self.open()
+
+    def open(self):
+        with open(self.path, 'r+b') as f:
+            self.map = mmap.mmap(f.fileno(), 0)
+        (magic, self.seed, self.talent_points, *values, count, self.sorted_count) = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a talent tree save")
+        self.stats = dict(zip(tree.STATS, values[:4]))
+        self.additional_points = dict(zip(tree.STATS, values[4:]))
+        self.records = np.frombuffer(self.map, dtype=RECORD, count=count, offset=HEADER.size)
+        sorted_records = self.records[:self.sorted_count]
+        self.keys = cell_key(sorted_records['column'].astype(np.int64), sorted_records['row'].astype(np.int64))
+        # Records appended since the last full write
+        self.tail = {(int(r['column']), int(r['row'])): i
+                     for i, r in enumerate(self.records[self.sorted_count:], self.sorted_count)}
+
+    def close(self):
+        self.records = self.keys = None
+        self.map.close()
+
+    def index_of(self, column, row):
+        i = self.tail.get((column, row))
+        if i is not None:
+            return i
+        key = cell_key(column, row)
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and self.keys[i] == key:
+            return i
+        return None
+
+    def make_player(self):
+        player = tree.Player()
+        player.talent_points = self.talent_points
+        player.stats.update(self.stats)
+        player.additional_points.update(self.additional_points)
+        # Running totals straight from the records, without building nodes
+        records = self.records
+        common = (records['flags'] & (LEARNED | RARE)) == LEARNED
+        stats = records['stat'][common]
+        totals = np.bincount(stats, weights=records['boost'][common], minlength=len(tree.STATS))
+        counts = np.bincount(stats, minlength=len(tree.STATS))
+        for i, stat in enumerate(tree.STATS):
+            player.boost_totals[stat] = int(totals[i])
+            player.common_counts[stat] = int(counts[i])
+        self.player = player
+        return player
+
+    def materialize(self, position, node_index):
+        # Build the saved node at `position` and link it to its neighbours
+        # in memory. Returns None if the save has no node there.
+        column, row = tree.lattice_cell(position)
+        i = self.index_of(column, row)
+        if i is None:
+            return None
+        _, _, stat, boost, flags, parent = self.records[i].tolist()
+        node = tree.TalentNode(tree.STATS[stat], boost, 'rare' if flags & RARE else 'common', position)
+        node.learned = bool(flags & LEARNED)
+        node.learnable = bool(flags & LEARNABLE)
+        node_index[position] = node
+        if node.learned and self.player:
+            self.player.learned[node.stat].add(node)
+
+        for direction, (dx, dy) in tree.DIRECTIONS.items():
+            neighbour = node_index.get((position[0] + dx * tree.GRID_SPACING, position[1] + dy * tree.GRID_SPACING))
+            if neighbour is None:
+                continue
+            if parent != NO_PARENT and DIRECTION_NAMES[parent] == direction:
+                neighbour.children[OPPOSITE[direction]] = node
+            else:
+                j = self.index_of(column + dx, row + dy)
+                if j is not None and self.records[j]['parent'] == DIRECTION_NAMES.index(OPPOSITE[direction]) \
+                        and tree.parent_of(neighbour, node_index)[0] is None:
+                    node.children[direction] = neighbour
+        return node
+
+    def materialize_all(self, node_index):
+        for column, row in zip(self.records['column'].tolist(), self.records['row'].tolist()):
+            position = node_position(column, row)
+            if position not in node_index:
+                self.materialize(position, node_index)
+
+    def save(self, node_index, player):
+        # Write the records of the player's changed nodes that differ from
+        # the file. Returns the number of records written.
+        updates, appends = {}, {}
+        for node in player.changed:
+            column, row = tree.lattice_cell(node.position)
+            i = self.index_of(column, row)
+            if i is None and not (node.learned or node.learnable):
+                continue  # Untouched, regenerated from the seed
+            direction = parent_direction(node, node_index)
+            if direction is None and i is not None and self.records[i]['parent'] != NO_PARENT:
+                direction = DIRECTION_NAMES[self.records[i]['parent']]  # Parent not in memory, keep the saved one
+            record = record_of(node, direction)
+            if i is None:
+                appends[column, row] = record
+            elif tuple(self.records[i].tolist()) != record:
+                updates[i] = record
+        player.changed.clear()
+
+        count = len(self.records) + len(appends)
+        if count - self.sorted_count > max(MIN_TAIL, self.sorted_count):
+            records = self.records.copy()
+            for i, record in updates.items():
+                records[i] = record
+            records = np.concatenate([records, np.array(list(appends.values()), dtype=RECORD)])
+            records = records[np.argsort(cell_key(records['column'].astype(np.int64), records['row'].astype(np.int64)))]
+            self.close()
+            write_file(self.path, header_for(player, count, count), records)
+            self.open()
+            return len(updates) + len(appends)
+
+        for i, record in updates.items():
+            self.map[HEADER.size + i * RECORD.itemsize:HEADER.size + (i + 1) * RECORD.itemsize] = \
+                np.array(record, dtype=RECORD).tobytes()
+        header = header_for(player, count, self.sorted_count)
+        if appends:
+            # Records before the header that counts them, so a save cut
+            # short never leaves a header claiming records that are missing
+            end = HEADER.size + len(self.records) * RECORD.itemsize
+            self.map.flush()
+            self.close()
+            with open(self.path, 'r+b') as f:
+                f.seek(end)
+                f.write(np.array(list(appends.values()), dtype=RECORD).tobytes())
+                f.truncate()
+                f.flush()
+                f.seek(0)
+                f.write(header)
+            self.open()
+        else:
+            self.map[:HEADER.size] = header
+            self.map.flush()
+        return len(updates) + len(appends)
+
+
+def load(path):
+    # Open a save and make it the tree's source for nodes not yet in memory.
+    # Returns (roots, node_index, player, store).
+    store = TalentStore(path)
+    tree.seed(store.seed)
+    player = store.make_player()
+    tree.saved_nodes = store
+    node_index = tree.NodeIndex()
+    root = tree.node_in(node_index, tree.ROOT_POSITION)
+    player.talent_tree = [root]
+    return [root], node_index, player, store
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    import eventlog
+    import time
+
+    # Save a large grown tree, then time opening it and an incremental save
+    parser = argparse.ArgumentParser(description="Talent tree save benchmark")
+    parser.add_argument('--nodes', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    tree.seed(args.seed)
+    roots, node_index = tree.generate_talent_tree()
+    player = tree.Player(roots)
+    player.talent_points = 10 ** 12
+    frontier = list(roots)
+    with eventlog.muted():
+        while len(node_index) < args.nodes and frontier:
+            node = frontier.pop(0)
+            if node.learnable and node.learn(player, node_index):
+                frontier.extend(child for child in node.children.values() if child)
+
+    path = os.path.join(tempfile.mkdtemp(), 'tree.sav')
+    start = time.perf_counter()
+    create(path, node_index, player).close()
+    print(f"Saved {len(node_index)} nodes in {(time.perf_counter() - start) * 1000:.1f} ms, "
+          f"{os.path.getsize(path)} bytes")
+
+    start = time.perf_counter()
+    roots, loaded_index, loaded_player, store = load(path)
+    print(f"Opened in {(time.perf_counter() - start) * 1000:.2f} ms, {len(loaded_index)} node(s) built")
+    print("Stats match" if loaded_player.stats == player.stats else "Stats DIFFER")
+
+    # Learn a node on the edge of the saved tree
+    column, row = store.records[np.flatnonzero(store.records['flags'] & LEARNABLE)[0]][['column', 'row']].tolist()
+    with eventlog.muted():
+        tree.node_in(loaded_index, node_position(column, row)).learn(loaded_player, loaded_index)
+    start = time.perf_counter()
+    written = store.save(loaded_index, loaded_player)
+    print(f"Incremental save wrote {written} record(s) in {(time.perf_counter() - start) * 1000:.2f} ms")
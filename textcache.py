@@ -0,0 +1,81 @@
+from collections import OrderedDict
+import pygame
+
+# Shared text rendering cache. Font objects are created once per
+# (face, size), and rendered text surfaces are kept in an LRU keyed by
+# (text, font, color, antialias), so labels that do not change between
+# frames are not re-rendered every frame.
+
+MAX_SURFACES = 512
+
+
+class TextCache:
+    def __init__(self, max_surfaces=MAX_SURFACES):
+        self.max_surfaces = max_surfaces
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.font_hits = 0
+        self.font_misses = 0
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, face, size, system=True):
+        # system=True matches pygame.font.SysFont, False matches pygame.font.Font
+        key = (face, size, system)
+        font = self.fonts.get(key)
+        if font is None:
+            self.font_misses += 1
+            font = pygame.font.SysFont(face, size) if system else pygame.font.Font(face, size)
+            self.fonts[key] = font
+        else:
+            self.font_hits += 1
+        return font
+
+    def render(self, text, font, color, antialias=True):
+        key = (text, font, color, antialias)
+        surfaces = self.surfaces
+        surface = surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        surfaces[key] = surface
+        if len(surfaces) > self.max_surfaces:
+            surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.fonts.clear()
+
+    def stats(self):
+        return {
+            'fonts': len(self.fonts),
+            'font_hits': self.font_hits,
+            'font_misses': self.font_misses,
+            'surfaces': len(self.surfaces),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def report(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0
+        return (f"Text cache: {self.hits}/{lookups} surface hits ({hit_rate:.0%}), "
+                f"{len(self.surfaces)} surfaces, {len(self.fonts)} fonts "
+                f"({self.font_misses} font loads)")
+
+
+# Cache shared by the whole program
+cache = TextCache()
+
+def get_font(face, size, system=True):
+    return cache.font(face, size, system)
+
+def render(text, font, color, antialias=True):
+    return cache.render(text, font, color, antialias)
+
+def report():
+    return cache.report()
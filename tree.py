@@ -1,5 +1,102 @@
+import math
 import pygame
+import textcache
 import random
+import eventlog
+from profiler import FrameProfiler
+
+# Seed for node generation. What sits in each lattice cell is a pure
+# function of (seed, cell), so any part of the tree can be dropped and
+# generated again later exactly as it was.
+talent_seed = random.getrandbits(64)
+
+def seed(value):
+    global talent_seed
+    talent_seed = value
+
+# Saved nodes not yet in memory (a talentsave.TalentStore), or None
+saved_nodes = None
+
+# Nodes sit on a lattice GRID_SPACING apart, starting from the root
+ROOT_POSITION = (400, 300)
+GRID_SPACING = 100
+DIRECTIONS = {'up': (0, -1), 'down': (0, 1), 'left': (-1, 0), 'right': (1, 0)}
+STATS = ['strength', 'agility', 'intelligence', 'vitality']
+
+# Chance that a cell holds a node. Nodes used to get a 50% roll from every
+# neighbour that grew into them; 60% per cell gives trees of the same size.
+CELL_CHANCE = 0.6
+MASK = (1 << 64) - 1
+
+def mix(value):
+    # splitmix64 finaliser
+    value = (value + 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+def cell(column, row):
+    # Contents of a lattice cell (in grid steps from the root) as
+    # (stat, boost, rarity), or None if the cell is empty
+    bits = mix(mix(mix(talent_seed & MASK) ^ (column & MASK)) ^ (row & MASK))
+    if bits & 0xffff >= CELL_CHANCE * 0x10000 and (column, row) != (0, 0):
+        return None  # Empty cell; the root always exists
+    stat = STATS[bits >> 16 & 3]
+    boost = 1 + (bits >> 18 & 0xffff) % 5
+    rarity = 'rare' if (bits >> 34 & 0xffff) < 0.15 * 0x10000 and (column, row) != (0, 0) else 'common'
+    return stat, boost, rarity
+
+def lattice_cell(position):
+    return (position[0] - ROOT_POSITION[0]) // GRID_SPACING, (position[1] - ROOT_POSITION[1]) // GRID_SPACING
+
+# Nodes in memory are also bucketed into chunks of CHUNK_CELLS x CHUNK_CELLS
+# lattice cells, so eviction can visit one area of the tree without
+# walking every node the player has learned
+CHUNK_CELLS = 8
+
+def chunk_of(position):
+    column, row = lattice_cell(position)
+    return int(column // CHUNK_CELLS), int(row // CHUNK_CELLS)
+
+def chunk_rect(chunk):
+    # World (left, top, right, bottom) of the lattice points in a chunk
+    left = ROOT_POSITION[0] + chunk[0] * CHUNK_CELLS * GRID_SPACING
+    top = ROOT_POSITION[1] + chunk[1] * CHUNK_CELLS * GRID_SPACING
+    span = (CHUNK_CELLS - 1) * GRID_SPACING
+    return left, top, left + span, top + span
+
+class NodeIndex(dict):
+    # Lattice position -> node, keeping `chunks` (chunk -> set of
+    # positions) in step as nodes are added and removed
+    def __init__(self):
+        super().__init__()
+        self.chunks = {}
+
+    def __setitem__(self, position, node):
+        super().__setitem__(position, node)
+        self.chunks.setdefault(chunk_of(position), set()).add(position)
+
+    def __delitem__(self, position):
+        super().__delitem__(position)
+        chunk = chunk_of(position)
+        bucket = self.chunks[chunk]
+        bucket.discard(position)
+        if not bucket:
+            del self.chunks[chunk]
+
+    def chunks_in(self, left, top, right, bottom):
+        # Chunks holding nodes that overlap a world rectangle
+        x0, y0 = chunk_of((left, top))
+        x1, y1 = chunk_of((right, bottom))
+        chunks = self.chunks
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) in chunks]
+
+def node_in(node_index, position):
+    # The node at `position`, loading it from the save if it is not in memory yet
+    node = node_index.get(position)
+    if node is None and saved_nodes is not None:
+        node = saved_nodes.materialize(position, node_index)
+    return node
 
 # Define rare talents
 RARE_TALENTS = {
@@ -10,6 +107,8 @@ RARE_TALENTS = {
 }
 
 class TalentNode:
+    __slots__ = ('stat', 'boost', 'rarity', 'learned', 'learnable', 'position', 'children', 'expanded')
+
     def __init__(self, stat, boost, rarity='common', position=(0, 0)):
         self.stat = stat
         self.boost = boost
@@ -18,6 +117,20 @@ class TalentNode:
         self.learnable = False
         self.position = position
         self.children = {'up': None, 'down': None, 'left': None, 'right': None}
+        self.expanded = False  # Whether the children have been generated
+
+    def reset(self, stat, boost, rarity, position):
+        # Reuse an evicted node for another cell, keeping its children dict
+        self.stat = stat
+        self.boost = boost
+        self.rarity = rarity
+        self.learned = False
+        self.learnable = False
+        self.position = position
+        children = self.children
+        for direction in children:
+            children[direction] = None
+        self.expanded = False
 
     def generate_description(self, player):
         if self.rarity == 'rare':
@@ -25,114 +138,329 @@ class TalentNode:
         else:
             return f"Boosts {self.stat} by {self.boost} (+{player.additional_points[self.stat]}) points."
 
-    def learn(self, player, occupied_positions):
-        cost = 2 if self.rarity == 'rare' else 1
-        if self.learnable and player.talent_points >= cost:
-            if self.rarity == 'rare':
-                # Apply rare talent effect
-                player.additional_points[self.stat] += 2
-                for node in player.talent_tree:
-                    if node.stat == self.stat and node.rarity == 'common':
-                        node.description = node.generate_description(player)  # Update description
-            else:
-                player.stats[self.stat] += self.boost + player.additional_points[self.stat]
-
-            player.talent_points -= cost
-            self.learned = True
-            self.learnable = False
-            print(f"Learned {self.stat} node: +{self.boost} {self.stat}")
-            for child in self.children.values():
-                if child:
-                    child.learnable = True  # Make children learnable
-                    generate_children(child, occupied_positions)  # Generate new observable nodes around them
+    def cost(self):
+        return 2 if self.rarity == 'rare' else 1
 
-    def draw(self, surface, offset, mouse_pos, scale, player):
+    def learn(self, player, node_index):
+        return bool(learn_many(player, [self], node_index))
+
+    def hit_box(self, offset, scale):
         adjusted_position = ((self.position[0] + offset[0]) * scale, (self.position[1] + offset[1]) * scale)
-        is_hovered = pygame.Rect(adjusted_position[0] - 20 * scale, adjusted_position[1] - 20 * scale, 40 * scale, 40 * scale).collidepoint(mouse_pos)
-        
+        return pygame.Rect(adjusted_position[0] - 20 * scale, adjusted_position[1] - 20 * scale, 40 * scale, 40 * scale)
+
+    def screen_position(self, offset, scale):
+        return ((self.position[0] + offset[0]) * scale, (self.position[1] + offset[1]) * scale)
+
+    def color(self, is_hovered=False):
         if self.learned:
             if self.rarity == 'rare':
-                color = (0, 100, 255)  # Distinct blue for learned rare talents
-            else:
-                color = (0, 255, 0)  # Green if learned and common
+                return (0, 100, 255)  # Distinct blue for learned rare talents
+            return (0, 255, 0)  # Green if learned and common
         elif self.learnable:
             if self.rarity == 'rare':
-                color = (0, 0, 255)  # Bright blue if learnable and rare
-                if is_hovered:
-                    color = (100, 100, 255)  # Lighter blue if hovered
-            else:
-                color = (255, 255, 255)  # White if learnable
-                if is_hovered:
-                    color = (255, 255, 0)  # Yellow if hovered
-        else:
-            if self.rarity == 'rare':
-                color = (0, 0, 100)  # Dull blue if observable and rare
-            else:
-                color = (100, 100, 100)  # Grey if observable
+                return (100, 100, 255) if is_hovered else (0, 0, 255)  # Bright blue, lighter if hovered
+            return (255, 255, 0) if is_hovered else (255, 255, 255)  # White if learnable, yellow if hovered
+        elif self.rarity == 'rare':
+            return (0, 0, 100)  # Dull blue if observable and rare
+        return (100, 100, 100)  # Grey if observable
 
-        pygame.draw.circle(surface, color, adjusted_position, 20 * scale)
-        font = pygame.font.SysFont(None, int(24 * scale))
-        text = font.render(self.stat[0].upper(), True, (0, 0, 0))
+    def draw(self, surface, offset, scale, is_hovered=False):
+        adjusted_position = self.screen_position(offset, scale)
+        pygame.draw.circle(surface, self.color(is_hovered), adjusted_position, 20 * scale)
+        font = textcache.get_font(None, int(24 * scale))
+        text = textcache.render(self.stat[0].upper(), font, (0, 0, 0))
         surface.blit(text, (adjusted_position[0] - 5 * scale, adjusted_position[1] - 10 * scale))
 
-        # Display description if hovered
-        if is_hovered:
-            description_font = pygame.font.SysFont(None, int(20 * scale))
-            description_text = description_font.render(self.generate_description(player), True, (255, 255, 255))
-            surface.blit(description_text, (adjusted_position[0] + 25 * scale, adjusted_position[1] - 10 * scale))
-
-        # Draw children
-        for direction, child in self.children.items():
+    def draw_edges(self, surface, offset, scale, stubs=False):
+        # Lines to the children. Edges run over the parent's circle but under
+        # the child's, so they are drawn full length before the circles, and
+        # with stubs=True just the part inside this node's circle afterwards.
+        adjusted_position = self.screen_position(offset, scale)
+        for child in self.children.values():
             if child:
-                adjusted_end = ((child.position[0] + offset[0]) * scale, (child.position[1] + offset[1]) * scale)
+                adjusted_end = child.screen_position(offset, scale)
+                if stubs:
+                    dx = (child.position[0] - self.position[0]) / GRID_SPACING
+                    dy = (child.position[1] - self.position[1]) / GRID_SPACING
+                    adjusted_end = (adjusted_position[0] + dx * 20 * scale, adjusted_position[1] + dy * 20 * scale)
                 pygame.draw.line(surface, (255, 255, 255), adjusted_position, adjusted_end)
-                child.draw(surface, offset, mouse_pos, scale, player)
+
+    def draw_description(self, surface, offset, scale, player):
+        adjusted_position = self.screen_position(offset, scale)
+        description_font = textcache.get_font(None, int(20 * scale))
+        description_text = textcache.render(self.generate_description(player), description_font, (255, 255, 255))
+        surface.blit(description_text, (adjusted_position[0] + 25 * scale, adjusted_position[1] - 10 * scale))
+
+# Free list of nodes dropped by evict(), reused by generate_children()
+free_nodes = []
+MAX_FREE_NODES = 1024
+
+def new_node(stat, boost, rarity, position):
+    if free_nodes:
+        node = free_nodes.pop()
+        node.reset(stat, boost, rarity, position)
+        return node
+    return TalentNode(stat, boost, rarity, position)
 
 def generate_talent_tree():
-    stat = random.choice(['strength', 'agility', 'intelligence', 'vitality'])
-    boost = random.randint(1, 5)
-    root_node = TalentNode(stat, boost, position=(400, 300))
+    root_node = TalentNode(*cell(0, 0), position=ROOT_POSITION)
     root_node.learnable = True  # Root node is learnable initially
-    occupied_positions = {(400, 300)}
-    generate_children(root_node, occupied_positions)  # Generate initial observable nodes
-    return [root_node], occupied_positions
-
-def generate_children(node, occupied_positions):
-    directions = {
-        'up': (0, -100),
-        'down': (0, 100),
-        'left': (-100, 0),
-        'right': (100, 0)
-    }
-    
-    for direction, (dx, dy) in directions.items():
-        new_position = (node.position[0] + dx, node.position[1] + dy)
-        if node.children[direction] is None and new_position not in occupied_positions and random.random() < 0.5:
-            stat = random.choice(['strength', 'agility', 'intelligence', 'vitality'])
-            boost = random.randint(1, 5)
-            rarity = 'rare' if random.random() < 0.15 else 'common'
-            child_node = TalentNode(stat, boost, rarity, position=new_position)
-            node.children[direction] = child_node
-            occupied_positions.add(new_position)
-            child_node.learnable = False  # New nodes are observable
-
-def draw_talent_tree(surface, nodes, offset, mouse_pos, scale, player):
+    node_index = NodeIndex()
+    node_index[ROOT_POSITION] = root_node
+    generate_children(root_node, node_index)  # Generate initial observable nodes
+    return [root_node], node_index
+
+def generate_children(node, node_index, claim=False):
+    # Fill in the node's children from the lattice cells around it. A cell
+    # that already holds a node belongs to that node's parent, except that
+    # with claim=True (the node was just learned) it takes over observable
+    # nodes hanging off other unlearned nodes. Returns the children added.
+    added = []
+    column, row = lattice_cell(node.position)
+    for direction, (dx, dy) in DIRECTIONS.items():
+        if node.children[direction] is not None:
+            continue
+        new_position = (node.position[0] + dx * GRID_SPACING, node.position[1] + dy * GRID_SPACING)
+        child_node = node_in(node_index, new_position)
+        if child_node:
+            if not claim or child_node.learned or child_node.learnable:
+                continue
+            detach(child_node, node_index)
+        else:
+            contents = cell(column + dx, row + dy)
+            if contents is None:
+                continue
+            child_node = new_node(*contents, new_position)  # New nodes are observable
+            node_index[new_position] = child_node
+        node.children[direction] = child_node
+        added.append(child_node)
+    node.expanded = True
+    return added
+
+def parent_of(node, node_index):
+    for dx, dy in DIRECTIONS.values():
+        neighbour = node_index.get((node.position[0] + dx * GRID_SPACING, node.position[1] + dy * GRID_SPACING))
+        if neighbour:
+            for direction, child in neighbour.children.items():
+                if child is node:
+                    return neighbour, direction
+    return None, None
+
+def detach(node, node_index):
+    # Unhook a node from its parent; the parent regenerates that side later.
+    # Returns the parent, or None.
+    parent, direction = parent_of(node, node_index)
+    if parent:
+        parent.children[direction] = None
+        parent.expanded = False
+    return parent
+
+def reveal(node_index, nodes):
+    # Generate the children of learned and learnable nodes that have not
+    # been expanded yet (or lost children to eviction). Returns True if
+    # anything was added.
+    added = False
     for node in nodes:
-        node.draw(surface, offset, mouse_pos, scale, player)
+        if not node.expanded and (node.learned or node.learnable):
+            for child in generate_children(node, node_index, claim=node.learned):
+                child.learnable = child.learnable or node.learned
+                added = True
+    return added
+
+def evict(node_index, left, top, right, bottom, previous=None):
+    # Forget observable leaf nodes outside the given world rectangle, then
+    # any parents that leaves them outside it as observable leaves. They
+    # are regenerated identically by reveal() when the view comes back.
+    # `previous` is the rectangle passed last time: nodes outside it were
+    # evicted then and nodes are only added near the view, so only chunks
+    # overlapping it are visited. Without it every chunk is. Returns the
+    # number of nodes dropped.
+    def outside(position):
+        x, y = position
+        return not (left <= x <= right and top <= y <= bottom)
+
+    def evictable(node):
+        return (not node.learned and not node.learnable and not any(node.children.values())
+                and not (saved_nodes and saved_nodes.index_of(*lattice_cell(node.position)) is not None))
+
+    chunks = list(node_index.chunks) if previous is None else node_index.chunks_in(*previous)
+    stack = []
+    for chunk in chunks:
+        chunk_left, chunk_top, chunk_right, chunk_bottom = chunk_rect(chunk)
+        if left <= chunk_left and chunk_right <= right and top <= chunk_top and chunk_bottom <= bottom:
+            continue  # Wholly kept
+        stack.extend(node_index[position] for position in node_index.chunks[chunk] if outside(position))
+    dropped = 0
+    while stack:
+        node = stack.pop()
+        if node_index.get(node.position) is not node or not evictable(node):
+            continue
+        parent = detach(node, node_index)
+        if parent and outside(parent.position):
+            stack.append(parent)
+        del node_index[node.position]
+        if len(free_nodes) < MAX_FREE_NODES:
+            free_nodes.append(node)
+        dropped += 1
+    return dropped
 
-def handle_click(nodes, player, mouse_pos, offset, occupied_positions, scale):
+def learn_many(player, nodes, node_index):
+    # Learn a whole build in one pass, parents before children. Nodes that
+    # are not learnable or affordable when reached are skipped. Stat totals
+    # are recomputed once per stat touched. Returns the nodes learned.
+    learned = []
     for node in nodes:
-        if node is None:
+        cost = node.cost()
+        if not node.learnable or player.talent_points < cost:
             continue
-        adjusted_position = ((node.position[0] + offset[0]) * scale, (node.position[1] + offset[1]) * scale)
-        if node.learnable and pygame.Rect(adjusted_position[0] - 20 * scale, adjusted_position[1] - 20 * scale, 40 * scale, 40 * scale).collidepoint(mouse_pos):
-            node.learn(player, occupied_positions)
-            return
-        handle_click([child for child in node.children.values() if child], player, mouse_pos, offset, occupied_positions, scale)
+        player.talent_points -= cost
+        node.learned = True
+        node.learnable = False
+        player.track(node, 1)
+        player.changed[node] = None
+        learned.append(node)
+        if eventlog.info:
+            eventlog.emit(eventlog.TalentLearned(node.stat, node.boost, node.rarity))
+        generate_children(node, node_index, claim=True)
+        for child in node.children.values():
+            if child and not child.learned:
+                child.learnable = True  # Make children learnable; their own children are revealed when seen
+                player.changed[child] = None
+    player.update_stats({node.stat for node in learned})
+    return learned
+
+def respec(player, nodes):
+    # Unlearn nodes, and every learned node below them, refunding their
+    # points. Returns the nodes unlearned.
+    unlearned = []
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if not node.learned:
+            continue
+        node.learned = False
+        node.learnable = True  # Its parent is still learned unless it is unlearned too
+        player.talent_points += node.cost()
+        player.track(node, -1)
+        player.changed[node] = None
+        unlearned.append(node)
+        stack.extend(child for child in node.children.values() if child)
+    for node in unlearned:
+        for child in node.children.values():
+            if child:
+                child.learnable = False  # Parent no longer learned
+                player.changed[child] = None
+    player.update_stats({node.stat for node in unlearned})
+    return unlearned
+
+def node_at(node_index, mouse_pos, offset, scale):
+    # The node under the mouse: snap the mouse to the nearest lattice point,
+    # look it up, then confirm with the node's hit box
+    world_x = mouse_pos[0] / scale - offset[0]
+    world_y = mouse_pos[1] / scale - offset[1]
+    position = (ROOT_POSITION[0] + round((world_x - ROOT_POSITION[0]) / GRID_SPACING) * GRID_SPACING,
+                ROOT_POSITION[1] + round((world_y - ROOT_POSITION[1]) / GRID_SPACING) * GRID_SPACING)
+    node = node_index.get(position)
+    if node and node.hit_box(offset, scale).collidepoint(mouse_pos):
+        return node
+    return None
+
+def nodes_in_view(node_index, view, offset, scale):
+    # Nodes that can draw into `view` (a screen rect): those within one
+    # lattice step of it, so edges coming in from just outside are kept.
+    # Walks the lattice cells under the view, or the whole index if smaller.
+    margin = GRID_SPACING
+    left = view[0] / scale - offset[0] - margin
+    top = view[1] / scale - offset[1] - margin
+    right = (view[0] + view[2]) / scale - offset[0] + margin
+    bottom = (view[1] + view[3]) / scale - offset[1] + margin
+    first_x = ROOT_POSITION[0] + math.ceil((left - ROOT_POSITION[0]) / GRID_SPACING) * GRID_SPACING
+    first_y = ROOT_POSITION[1] + math.ceil((top - ROOT_POSITION[1]) / GRID_SPACING) * GRID_SPACING
+    columns = range(first_x, int(right) + 1, GRID_SPACING)
+    rows = range(first_y, int(bottom) + 1, GRID_SPACING)
+    if saved_nodes is not None or len(columns) * len(rows) < len(node_index):
+        nodes = (node_in(node_index, (x, y)) for y in rows for x in columns)
+        return [node for node in nodes if node]
+    return [node for (x, y), node in node_index.items() if left <= x <= right and top <= y <= bottom]
+
+def draw_talent_tree(surface, node_index, offset, scale, view=None):
+    # Draw the part of the tree inside `view` (defaults to the whole surface)
+    nodes = nodes_in_view(node_index, view or surface.get_rect(), offset, scale)
+    for node in nodes:
+        node.draw_edges(surface, offset, scale)
+    for node in nodes:
+        node.draw(surface, offset, scale)
+    for node in nodes:
+        node.draw_edges(surface, offset, scale, stubs=True)
+
+class TreeRenderer:
+    # Draws the talent tree from a cached layer. The layer holds the static
+    # tree (every node in its normal colour) for a region around the window
+    # at the current scale, culled to that region. Each frame blits the layer
+    # and redraws only the hovered node and its description. The layer is
+    # rebuilt when the scale changes, the view pans off it, or invalidate()
+    # is called after nodes were learned or generated. Rebuilding also
+    # reveals nodes coming into the region and evicts observable nodes
+    # outside it, so memory follows what the player has learned.
+
+    def __init__(self, node_index, margin=0.5):
+        self.node_index = node_index
+        self.margin = margin  # Extra layer size on each side, in windows
+        self.layer = None
+        self.layer_rect = None  # Area of the scaled world covered by the layer
+        self.layer_scale = None
+        self.kept = None  # World rectangle the last eviction kept, None to check every node
+        self.rebuilds = 0
+
+    def invalidate(self, evict_all=False):
+        # evict_all: nodes away from the view may have become evictable (a
+        # respec unlearns them all), so check the whole tree next rebuild
+        self.layer = None
+        if evict_all:
+            self.kept = None
+
+    def rebuild(self, view, scale):
+        margin_x = int(view.w * self.margin)
+        margin_y = int(view.h * self.margin)
+        self.layer_rect = view.inflate(2 * margin_x, 2 * margin_y)
+        self.layer_scale = scale
+        self.layer = pygame.Surface(self.layer_rect.size)
+        layer_offset = (-self.layer_rect.x / scale, -self.layer_rect.y / scale)
+        reveal(self.node_index, nodes_in_view(self.node_index, self.layer.get_rect(), layer_offset, scale))
+        keep = 2 * GRID_SPACING
+        kept = (self.layer_rect.left / scale - keep, self.layer_rect.top / scale - keep,
+                self.layer_rect.right / scale + keep, self.layer_rect.bottom / scale + keep)
+        evict(self.node_index, *kept, previous=self.kept)
+        self.kept = kept
+        draw_talent_tree(self.layer, self.node_index, layer_offset, scale)
+        self.rebuilds += 1
+
+    def draw(self, surface, offset, mouse_pos, scale, player):
+        # The window's view of the tree, in scaled world coordinates
+        view = pygame.Rect(round(-offset[0] * scale), round(-offset[1] * scale), *surface.get_size())
+        if self.layer is None or scale != self.layer_scale or not self.layer_rect.contains(view):
+            self.rebuild(view, scale)
+        position = (self.layer_rect.x - view.x, self.layer_rect.y - view.y)
+        surface.blit(self.layer, position)
+
+        hovered = node_at(self.node_index, mouse_pos, offset, scale)
+        if hovered:
+            # Same transform as the layer so the highlight lines up with it
+            view_offset = (-view.x / scale, -view.y / scale)
+            hovered.draw(surface, view_offset, scale, is_hovered=True)
+            hovered.draw_edges(surface, view_offset, scale, stubs=True)
+            hovered.draw_description(surface, view_offset, scale, player)
+
+def handle_click(node_index, player, mouse_pos, offset, scale):
+    # Returns True if a node was learned
+    node = node_at(node_index, mouse_pos, offset, scale)
+    if node and node.learnable:
+        return node.learn(player, node_index)
+    return False
 
 def draw_ui(surface, player, mouse_pos, show_stats):
-    font = pygame.font.SysFont(None, 36)
-    text = font.render(f"Talent Points: {player.talent_points}", True, (255, 255, 255))
+    font = textcache.get_font(None, 36)
+    text = textcache.render(f"Talent Points: {player.talent_points}", font, (255, 255, 255))
     surface.blit(text, (10, 10))
 
     # Calculate the position of the '+' button based on the text width
@@ -145,89 +473,169 @@ def draw_ui(surface, player, mouse_pos, show_stats):
     else:
         pygame.draw.rect(surface, (255, 255, 255), plus_button)  # White otherwise
 
-    plus_text = font.render("+", True, (0, 0, 0))
+    plus_text = textcache.render("+", font, (0, 0, 0))
     surface.blit(plus_text, (25 + text_width, 5))
 
     # Draw stats dropdown
     if show_stats:
         stats_text = [f"{stat.capitalize()}: {value}" for stat, value in player.stats.items()]
         for i, stat_text in enumerate(stats_text):
-            stat_surface = font.render(stat_text, True, (255, 255, 255))
+            stat_surface = textcache.render(stat_text, font, (255, 255, 255))
             surface.blit(stat_surface, (10, 50 + i * 30))
 
     return plus_button
 
-# Initialize Pygame
-pygame.init()
-
-# Set up display
-WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
-pygame.display.set_caption("Talent Tree")
-
-# Set up clock
-clock = pygame.time.Clock()
-
-# Generate the talent tree
-talent_tree, occupied_positions = generate_talent_tree()
-
 # Dummy player class with talent points
 class Player:
-    def __init__(self):
+    def __init__(self, talent_tree=None):
         self.stats = {'strength': 0, 'agility': 0, 'intelligence': 0, 'vitality': 0}
         self.talent_points = 100
         self.talent_tree = talent_tree  # Reference to the talent tree
         self.additional_points = {stat: 0 for stat in self.stats}  # Additional points for each stat
+        # Learned nodes by stat, and running totals of what they contribute
+        self.learned = {stat: set() for stat in self.stats}
+        self.boost_totals = {stat: 0 for stat in self.stats}  # Sum of learned common boosts
+        self.common_counts = {stat: 0 for stat in self.stats}  # Learned common nodes
+        self.changed = {}  # Nodes learned, unlearned or made (un)learnable since the last save, in order
 
-player = Player()
-
-# Camera offset and scale
-offset = [0, 0]
-scale = 1.0
-dragging = False
-last_mouse_pos = None
-show_stats = False
-
-# Main loop
-running = True
-while running:
-    mouse_pos = pygame.mouse.get_pos()
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:
-                dragging = True
-                last_mouse_pos = pygame.mouse.get_pos()
-            elif event.button == 3:
-                handle_click(talent_tree, player, mouse_pos, offset, occupied_positions, scale)
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if event.button == 1:
-                dragging = False
-                # Check if the '+' button was clicked
-                plus_button = draw_ui(screen, player, mouse_pos, show_stats)
-                if plus_button.collidepoint(mouse_pos):
-                    player.talent_points += 100
-        elif event.type == pygame.MOUSEWHEEL:
-            scale += event.y * 0.1
-            scale = max(0.5, min(2.0, scale))  # Limit zoom level
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_c:
-                show_stats = not show_stats
-
-    if dragging:
+    def track(self, node, sign):
+        # Add (sign=1) or remove (sign=-1) a learned node's contribution
+        stat = node.stat
+        if node.rarity == 'rare':
+            self.additional_points[stat] += 2 * sign  # Extra points on ALL common nodes of the stat
+        else:
+            self.boost_totals[stat] += node.boost * sign
+            self.common_counts[stat] += sign
+        if sign > 0:
+            self.learned[stat].add(node)
+        else:
+            self.learned[stat].discard(node)
+
+    def update_stats(self, stats):
+        for stat in stats:
+            self.stats[stat] = self.boost_totals[stat] + self.additional_points[stat] * self.common_counts[stat]
+
+    def learned_nodes(self):
+        return [node for nodes in self.learned.values() for node in nodes]
+
+WIDTH, HEIGHT = 800, 600
+
+def main(talent_seed=None, save_path=None):
+    if talent_seed is not None:
+        seed(talent_seed)
+
+    # Initialize Pygame
+    pygame.init()
+
+    # Set up display
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption("Talent Tree")
+
+    # Set up clock
+    clock = pygame.time.Clock()
+
+    # Generate the talent tree, or open the saved one
+    store = None
+    if save_path:
+        import os
+        import talentsave
+        if os.path.exists(save_path):
+            talent_tree, node_index, player, store = talentsave.load(save_path)
+        else:
+            talent_tree, node_index = generate_talent_tree()
+            player = Player(talent_tree)
+            store = talentsave.create(save_path, node_index, player)
+    else:
+        talent_tree, node_index = generate_talent_tree()
+        player = Player(talent_tree)
+    renderer = TreeRenderer(node_index)
+
+    def changed(evict_all=False):
+        renderer.invalidate(evict_all)
+        if store:
+            store.save(node_index, player)  # Only the records that changed
+        else:
+            player.changed.clear()  # Nothing to save them to
+
+    # Camera offset and scale
+    offset = [0, 0]
+    scale = 1.0
+    dragging = False
+    last_mouse_pos = None
+    show_stats = False
+
+    # Frame phase timings: F3 shows them, F4 writes them out as a trace
+    profiler = FrameProfiler()
+    profiler_font = textcache.get_font(None, 20)
+
+    # Main loop
+    running = True
+    while running:
+        profiler.mark('input')
         mouse_pos = pygame.mouse.get_pos()
-        dx = mouse_pos[0] - last_mouse_pos[0]
-        dy = mouse_pos[1] - last_mouse_pos[1]
-        offset[0] += dx / scale
-        offset[1] += dy / scale
-        last_mouse_pos = mouse_pos
-
-    screen.fill((0, 0, 0))
-    draw_talent_tree(screen, talent_tree, offset, mouse_pos, scale, player)
-    plus_button = draw_ui(screen, player, mouse_pos, show_stats)
-    pygame.display.flip()
-    clock.tick(60)
-
-pygame.quit()
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1:
+                    dragging = True
+                    last_mouse_pos = pygame.mouse.get_pos()
+                elif event.button == 3:
+                    if handle_click(node_index, player, mouse_pos, offset, scale):
+                        changed()
+            elif event.type == pygame.MOUSEBUTTONUP:
+                if event.button == 1:
+                    dragging = False
+                    # Check if the '+' button was clicked
+                    plus_button = draw_ui(screen, player, mouse_pos, show_stats)
+                    if plus_button.collidepoint(mouse_pos):
+                        player.talent_points += 100
+                        if store:
+                            store.save(node_index, player)
+            elif event.type == pygame.MOUSEWHEEL:
+                scale += event.y * 0.1
+                scale = max(0.5, min(2.0, scale))  # Limit zoom level
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_c:
+                    show_stats = not show_stats
+                elif event.key == pygame.K_r:
+                    if store:
+                        store.materialize_all(node_index)  # Respec reaches every learned node
+                    if respec(player, player.learned_nodes()):
+                        changed(evict_all=True)
+                elif event.key == pygame.K_F3:
+                    profiler.toggle()
+                elif event.key == pygame.K_F4:
+                    print(f"Frame trace written to {profiler.dump()}")
+
+        if dragging:
+            mouse_pos = pygame.mouse.get_pos()
+            dx = mouse_pos[0] - last_mouse_pos[0]
+            dy = mouse_pos[1] - last_mouse_pos[1]
+            offset[0] += dx / scale
+            offset[1] += dy / scale
+            last_mouse_pos = mouse_pos
+
+        profiler.mark('draw')
+        renderer.draw(screen, offset, mouse_pos, scale, player)  # Covers the whole window
+        profiler.mark('ui')
+        plus_button = draw_ui(screen, player, mouse_pos, show_stats)
+        if profiler.visible:
+            profiler.draw(screen, profiler_font)
+        profiler.mark('flip')
+        pygame.display.flip()
+        profiler.mark('wait')
+        clock.tick(60)
+        profiler.end_frame()
+
+    pygame.quit()
+    print(textcache.report())
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Talent tree")
+    parser.add_argument('--seed', type=int, default=None, help="seed for talent node generation")
+    parser.add_argument('--save', default=None, help="save file to open, or create, and keep up to date")
+    args = parser.parse_args()
+    main(args.seed, args.save)
@@ -0,0 +1,164 @@
+import random
+import pygame
+import gameplay
+from engine import GameEngine
+
+# Open-world mode: one large scrolling map split into square chunks instead
+# of a series of single-screen rooms.
+#
+# Only chunks near the player are simulated. The chunks within
+# `active_radius` of the player's chunk are active: their mobs and potions
+# are the engine's usual lists, so AI, shots and collisions run as in a
+# room, and shots are dropped once they leave the active area. The next
+# ring of chunks is loaded but asleep: its mobs keep their objects but are
+# not updated. Further chunks are stored as plain (type, x, y, hp, sword
+# angle) records, and chunks the player has never been near do not exist
+# yet; they are generated from the run seed and the chunk the first time
+# they load. Chunks are re-sorted and streamed each time the player crosses
+# into a new chunk, so the cost of a tick depends on the active area, not
+# on how many mobs the whole map holds.
+
+CHUNK_SIZE = 400  # Pixels; with an active radius of 1 the screen never shows a sleeping chunk
+WORLD_CHUNKS = (40, 40)
+MOBS_PER_CHUNK = 8  # 12800 mobs over the default map
+
+
+def generate_chunk(seed, chunk, count, pool=None):
+    rng = random.Random(f"{seed}:chunk:{chunk[0]},{chunk[1]}")
+    left, top = chunk[0] * CHUNK_SIZE, chunk[1] * CHUNK_SIZE
+    mobs = []
+    for _ in range(count):
+        x = left + rng.randint(0, CHUNK_SIZE - gameplay.MOB_SIZE)
+        y = top + rng.randint(0, CHUNK_SIZE - gameplay.MOB_SIZE)
+        mobs.append(gameplay.spawn(pool, rng.choice([gameplay.ShooterMob, gameplay.SwordMob]), x, y))
+    return mobs
+
+
+def mob_record(mob):
+    sword = getattr(mob, 'sword', None)
+    return (type(mob), mob.rect.x, mob.rect.y, mob.hp, sword.angle if sword else None)
+
+
+def restore_mob(record, pool=None):
+    mob_type, x, y, hp, angle = record
+    mob = gameplay.spawn(pool, mob_type, x, y)
+    mob.hp = hp
+    if angle is not None:
+        mob.sword.angle = angle
+    return mob
+
+
+class WorldEngine(GameEngine):
+    def __init__(self, chunks=WORLD_CHUNKS, mobs_per_chunk=MOBS_PER_CHUNK, active_radius=1, **kwargs):
+        super().__init__(rooms=False, **kwargs)
+        if self.pool:
+            self.pool.release_all(self.mobs)  # The room the base engine rolled
+        self.mobs = []
+        self.chunks = chunks
+        self.mobs_per_chunk = mobs_per_chunk
+        self.active_radius = active_radius
+        self.load_radius = active_radius + 1
+        self.world = pygame.Rect(0, 0, chunks[0] * CHUNK_SIZE, chunks[1] * CHUNK_SIZE)
+        self.loaded = {}  # chunk -> (mobs, potions) asleep in a loaded chunk
+        self.stored = {}  # chunk -> (mob records, potions) of unloaded chunks
+        self.player_chunk = None
+        self.player.rect.center = self.world.center
+        self.update_chunks()
+
+    def chunk_of(self, rect):
+        return (min(max(rect.centerx // CHUNK_SIZE, 0), self.chunks[0] - 1),
+                min(max(rect.centery // CHUNK_SIZE, 0), self.chunks[1] - 1))
+
+    def chunks_around(self, chunk, radius):
+        return {(x, y)
+                for x in range(max(chunk[0] - radius, 0), min(chunk[0] + radius + 1, self.chunks[0]))
+                for y in range(max(chunk[1] - radius, 0), min(chunk[1] + radius + 1, self.chunks[1]))}
+
+    def mob_count(self):
+        # Mobs currently in memory, awake or asleep
+        return len(self.mobs) + sum(len(mobs) for mobs, _ in self.loaded.values())
+
+    def check_room_transition(self):
+        # No rooms: keep the player on the map and follow them with the camera
+        rect = self.player.rect
+        rect.clamp_ip(self.world)
+        self.view.center = rect.center
+        self.view.clamp_ip(self.world)
+        if self.chunk_of(rect) != self.player_chunk:
+            self.update_chunks()
+
+    def update_chunks(self):
+        self.player_chunk = self.chunk_of(self.player.rect)
+
+        # Put active mobs and potions back into the chunks they have moved to
+        for mob in self.mobs:
+            self.load_chunk(self.chunk_of(mob.rect))[0].append(mob)
+        for potion in self.potions:
+            self.load_chunk(self.chunk_of(potion.rect))[1].append(potion)
+
+        # Stream chunks in and out around the player
+        wanted = self.chunks_around(self.player_chunk, self.load_radius)
+        for chunk in list(self.loaded):
+            if chunk not in wanted:
+                mobs, potions = self.loaded.pop(chunk)
+                self.stored[chunk] = ([mob_record(mob) for mob in mobs], potions)
+                if self.pool:
+                    self.pool.release_all(mobs)
+        for chunk in wanted:
+            self.load_chunk(chunk)
+
+        # Wake the chunks around the player
+        self.mobs, self.potions = [], []
+        active = self.chunks_around(self.player_chunk, self.active_radius)
+        for chunk in active:
+            mobs, potions = self.loaded[chunk]
+            self.mobs += mobs
+            self.potions += potions
+            mobs.clear()
+            potions.clear()
+        self.mob_grid.rebuild(self.mobs)
+        self.potion_grid.rebuild(self.potions)
+        columns = [x for x, _ in active]
+        rows = [y for _, y in active]
+        self.bounds = pygame.Rect(min(columns) * CHUNK_SIZE, min(rows) * CHUNK_SIZE,
+                                  (max(columns) - min(columns) + 1) * CHUNK_SIZE,
+                                  (max(rows) - min(rows) + 1) * CHUNK_SIZE)
+
+    def load_chunk(self, chunk):
+        # The (mobs, potions) lists of a chunk, loading it if needed
+        contents = self.loaded.get(chunk)
+        if contents is None:
+            stored = self.stored.pop(chunk, None)
+            if stored:
+                records, potions = stored
+                contents = ([restore_mob(record, self.pool) for record in records], potions)
+            else:
+                contents = (generate_chunk(self.streams.seed, chunk, self.mobs_per_chunk, self.pool), [])
+            self.loaded[chunk] = contents
+        return contents
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    import eventlog
+    from engine import run_headless
+    parser = argparse.ArgumentParser(description="Run the open-world mode headless")
+    parser.add_argument('--ticks', type=int, default=60 * 60)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--chunks', type=int, nargs=2, default=WORLD_CHUNKS, metavar=('COLUMNS', 'ROWS'))
+    parser.add_argument('--mobs-per-chunk', type=int, default=MOBS_PER_CHUNK)
+    parser.add_argument('--swarm', action='store_true')
+    parser.add_argument('--batch-ai', action='store_true')
+    args = parser.parse_args()
+
+    engine = WorldEngine(tuple(args.chunks), args.mobs_per_chunk, seed=args.seed, swarm=args.swarm,
+                         batch_ai=args.batch_ai)
+    start = time.perf_counter()
+    with eventlog.muted():
+        run_headless(args.ticks, engine=engine)
+    elapsed = time.perf_counter() - start
+    print(f"{args.chunks[0] * args.chunks[1] * args.mobs_per_chunk} mobs on the map, "
+          f"{engine.mob_count()} in memory, {len(engine.mobs)} awake")
+    print(f"Simulated {engine.ticks} ticks in {elapsed:.2f}s, {engine.ticks / elapsed:.0f} ticks/s; "
+          f"player in chunk {engine.player_chunk}, {len(engine.stored)} chunk(s) stored")